@@ -1,4 +1,5 @@
 import time
+import uuid
 import requests
 import sys
 import os
@@ -15,6 +16,13 @@ if not AGI_API_KEY:
 # The Sentinel Backend (Safety Layer)
 SENTINEL_URL = "http://localhost:8000/api/sentinel"
 
+# Per-attempt timeout; above the server's duplicate wait (SENTINEL_IDEMPOTENCY_WAIT)
+SENTINEL_TIMEOUT_SECONDS = 15
+# Give up on /execute after this long overall
+SENTINEL_DEADLINE_SECONDS = 180
+# Answers that mean "not decided yet, retry with the same key"
+RETRYABLE_STATUSES = ("IN_PROGRESS", "MODULE_BUSY")
+
 
 class AGIAgent:
     """
@@ -53,14 +61,41 @@ class AGIAgent:
         }
 
         # 1. Call Backend
-        try:
-            response = requests.post(
-                f"{SENTINEL_URL}/execute", json=payload, timeout=10
-            )
-            data = response.json()
-            print(f"\n🔍 [AGENT] Sentinel response: {data}")
-        except Exception as e:
-            print(f"❌ [AGENT] Error connecting to Sentinel: {e}")
+        # Same key on every retry, so Sentinel analyzes (and calls) only once.
+        # Timeouts, IN_PROGRESS and MODULE_BUSY are retried with backoff until
+        # Sentinel gives a final status.
+        headers = {"Idempotency-Key": str(uuid.uuid4())}
+        data = None
+        deadline = time.time() + SENTINEL_DEADLINE_SECONDS
+        backoff = 1
+        attempt = 0
+        while time.time() < deadline:
+            attempt += 1
+            try:
+                response = requests.post(
+                    f"{SENTINEL_URL}/execute",
+                    json=payload,
+                    headers=headers,
+                    timeout=SENTINEL_TIMEOUT_SECONDS,
+                )
+                data = response.json()
+            except requests.exceptions.Timeout:
+                print(f"⌛ [AGENT] Sentinel timed out (attempt {attempt}), retrying...")
+            except Exception as e:
+                print(f"❌ [AGENT] Error connecting to Sentinel: {e}")
+                return
+            else:
+                if data.get("status") not in RETRYABLE_STATUSES:
+                    print(f"\n🔍 [AGENT] Sentinel response: {data}")
+                    break
+                print(f"⏳ [AGENT] Sentinel says {data.get('status')} (attempt {attempt}), retrying...")
+                data = None
+
+            time.sleep(min(backoff, max(0, deadline - time.time())))
+            backoff = min(backoff * 2, 8)
+
+        if data is None:
+            print("❌ [AGENT] Sentinel did not give a final answer. Aborting.")
             return
 
         status = data.get("status")
@@ -77,8 +112,11 @@ class AGIAgent:
             self.wait_for_approval()
         elif status == "DECLINED":
             print(f"\n❌ [SENTINEL] Hard-blocked immediately. {analysis}")
-        else:
+        elif status == "EXECUTED":
             print("✅ [SENTINEL] Approved immediately.")
+        else:
+            # e.g. IDEMPOTENCY_CONFLICT: never treat as approval
+            print(f"\n⚠️ [SENTINEL] Not approved ({status}). {analysis}")
 
     def wait_for_approval(self, timeout_seconds: int = 180):
         """
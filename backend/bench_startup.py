@@ -0,0 +1,124 @@
+"""
+bench_startup.py - Cold Start Benchmark
+Spawns fresh interpreters with `python -X importtime` and reports how long it
+takes to import the backend, plus the slowest modules pulled in along the way.
+
+Usage (from backend/):
+    python bench_startup.py [--runs 5] [--module main] [--top 15]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    Parse `-X importtime` lines:
+        import time: self [us] | cumulative | imported package
+    Returns [(cumulative_us, self_us, module_name), ...].
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        try:
+            _, rest = line.split(":", 1)
+            self_us, cumulative_us, name = rest.split("|", 2)
+            rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+        except ValueError:
+            continue
+    return rows
+
+
+def _indent(name: str) -> int:
+    return len(name) - len(name.lstrip())
+
+
+def direct_children(rows: list, module: str) -> list:
+    """
+    Imports made directly by `module`. importtime prints a module after
+    everything it imported, one indent level (2 spaces) deeper, so they are
+    the rows just before it at exactly that depth.
+    """
+    targets = [i for i, r in enumerate(rows) if r[2].strip() == module]
+    if not targets:
+        return []
+    end = targets[-1]
+    depth = _indent(rows[end][2])
+
+    children = []
+    for row in reversed(rows[:end]):
+        row_depth = _indent(row[2])
+        if row_depth <= depth:
+            break
+        if row_depth == depth + 2:
+            children.append(row)
+    return children
+
+
+def run_once(module: str) -> tuple:
+    env = dict(os.environ, SENTINEL_WARMUP="0")
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    if proc.returncode != 0:
+        print(proc.stderr.strip().splitlines()[-1] if proc.stderr else "import failed")
+        sys.exit(proc.returncode)
+
+    return wall_ms, parse_importtime(proc.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure backend cold-start time.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    wall_times = []
+    import_times = []
+    last_rows = []
+
+    for _ in range(args.runs):
+        wall_ms, rows = run_once(args.module)
+        wall_times.append(wall_ms)
+        target = [r for r in rows if r[2].strip() == args.module]
+        import_times.append(target[-1][0] / 1000 if target else 0.0)
+        last_rows = rows
+
+    print(f"⏱️  [BENCH] import {args.module} x{args.runs}")
+    print(
+        f"    process wall:  median {statistics.median(wall_times):.1f} ms, "
+        f"min {min(wall_times):.1f} ms"
+    )
+    print(
+        f"    import {args.module}: median {statistics.median(import_times):.1f} ms, "
+        f"min {min(import_times):.1f} ms"
+    )
+
+    # What `module` imports itself, with everything underneath each one
+    children = sorted(direct_children(last_rows, args.module), reverse=True)
+    print(f"\n    slowest imports made by {args.module} (cumulative, last run):")
+    for cumulative_us, _, name in children[: args.top]:
+        print(f"    {cumulative_us / 1000:8.1f} ms  {name.strip()}")
+
+    # Any module, by its own time only
+    by_self = sorted(last_rows, key=lambda r: r[1], reverse=True)
+    print(f"\n    slowest modules by self time (last run):")
+    for _, self_us, name in by_self[: args.top]:
+        print(f"    {self_us / 1000:8.1f} ms  {name.strip()}")
+
+
+if __name__ == "__main__":
+    main()
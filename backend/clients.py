@@ -0,0 +1,107 @@
+"""
+clients.py - Lazy External Clients
+Groq, Telnyx (HTTP) and Sentry are only imported and constructed on first use,
+so importing the app stays cheap. Sentry is initialized in the startup hook;
+warm_up() pre-opens the Groq / Telnyx connections in the background.
+"""
+
+import os
+import threading
+
+SENTRY_DSN = "https://93f0c27a3a4f4a9b26fbbe83b2b3be6d@o4510413108477952.ingest.us.sentry.io/4510413862862848"
+
+TELNYX_BASE_URL = "https://api.telnyx.com/v2"
+
+_lock = threading.Lock()
+_groq_client = None
+_telnyx_session = None
+_sentry_ready = False
+
+
+def get_groq_client():
+    global _groq_client
+    if _groq_client is None:
+        with _lock:
+            if _groq_client is None:
+                from groq import Groq
+
+                # Read at first use so load_dotenv() in main has already run
+                _groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    return _groq_client
+
+
+def get_telnyx_session():
+    """
+    Shared requests.Session so Telnyx calls reuse keep-alive connections
+    instead of doing a fresh TLS handshake per call-control action.
+    """
+    global _telnyx_session
+    if _telnyx_session is None:
+        with _lock:
+            if _telnyx_session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                session.headers.update(
+                    {
+                        "Authorization": f"Bearer {os.getenv('TELNYX_API_KEY')}",
+                        "Content-Type": "application/json",
+                    }
+                )
+                # Keep-alive connections held open to Telnyx
+                pool_size = int(os.getenv("TELNYX_POOL_SIZE", "8"))
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+                session.mount("https://", adapter)
+                _telnyx_session = session
+    return _telnyx_session
+
+
+def get_sentry():
+    """
+    Returns the sentry_sdk module, initializing it on first use.
+    """
+    global _sentry_ready
+    import sentry_sdk
+
+    if not _sentry_ready:
+        with _lock:
+            if not _sentry_ready:
+                if SENTRY_DSN:
+                    sentry_sdk.init(
+                        dsn=SENTRY_DSN, traces_sample_rate=1.0, send_default_pii=True
+                    )
+                _sentry_ready = True
+    return sentry_sdk
+
+
+def _warm_up():
+    try:
+        # Touch the API so the client's connection pool has a live connection
+        get_groq_client().models.list()
+    except Exception as e:
+        print(f"⚠️ [WARMUP] Groq warm-up failed: {e}")
+
+    try:
+        get_telnyx_session().head(TELNYX_BASE_URL, timeout=5)
+    except Exception as e:
+        print(f"⚠️ [WARMUP] Telnyx warm-up failed: {e}")
+
+    print("🔥 [WARMUP] External clients ready")
+
+
+def warm_up(background: bool = True):
+    """
+    Startup hook: build the Groq / Telnyx clients and pre-open pooled connections.
+    Set SENTINEL_WARMUP=0 to skip (e.g. in tests or offline tools).
+    """
+    if os.getenv("SENTINEL_WARMUP", "1") == "0":
+        return None
+
+    if not background:
+        _warm_up()
+        return None
+
+    thread = threading.Thread(target=_warm_up, name="sentinel-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,158 @@
+"""
+conversation.py - Q&A Call Memory
+Keeps a bounded transcript per phone call so each spoken question can build on
+what was already discussed, and tracks the risk score as it evolves on the call.
+"""
+
+from collections import deque
+
+# Most recent Q&A turns kept verbatim in the prompt.
+MAX_TURNS = 4
+
+# Cap on the rolling summary. The model rewrites it on every Q&A turn; if a
+# turn has no model summary (e.g. Groq failed), turns sliding out of the window
+# are appended as short clipped notes instead.
+MAX_SUMMARY_CHARS = 1200
+
+# How far a single Q&A turn may move the risk score (0-100 scale).
+MAX_RISK_STEP = 15
+
+# Upper bound on concurrently tracked calls; the oldest call is evicted first.
+MAX_ACTIVE_CALLS = 32
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(str(text or "").split())
+    if len(text) <= limit:
+        return text
+    return text[: limit - 3].rstrip() + "..."
+
+
+class CallConversation:
+    """
+    Per-call Q&A state:
+    - context: static description of the action, rendered once when the call starts
+    - turns: sliding window of the latest (question, answer) pairs
+    - summary: model-written summary of the call so far (plus clipped notes
+      for turns it doesn't cover), shown once turns slide out of the window
+    - risk_score / analysis: current assessment, nudged after every question
+    """
+
+    def __init__(self, call_id: str, context: str, risk_score: int, analysis: str):
+        self.call_id = call_id
+        self.context = context
+        self.risk_score = int(risk_score or 0)
+        self.analysis = analysis
+        self.turns = deque()
+        self.summary = ""
+        # Turns taken so far, and how many of them `summary` already covers
+        self.turn_count = 0
+        self.summarized_turns = 0
+
+    def add_turn(self, question: str, answer: str, summary: str = None):
+        """
+        Record a turn. `summary` is the model's condensed summary of the whole
+        call including this turn; it replaces the previous one.
+        """
+        self.turns.append((question, answer))
+        self.turn_count += 1
+        if summary and str(summary).strip():
+            self.summary = _clip(summary, MAX_SUMMARY_CHARS)
+            self.summarized_turns = self.turn_count
+
+        while len(self.turns) > MAX_TURNS:
+            old_question, old_answer = self.turns.popleft()
+            dropped = self.turn_count - len(self.turns)
+            if dropped > self.summarized_turns:
+                # Not covered by a model summary: keep a clipped note instead
+                self._append_note(old_question, old_answer)
+                self.summarized_turns = dropped
+
+    def _append_note(self, question: str, answer: str):
+        line = f"- Approver asked: {_clip(question, 160)} | Sentinel said: {_clip(answer, 240)}"
+        lines = [l for l in self.summary.splitlines() if l]
+        lines.append(line)
+        # Drop the oldest notes first so the summary never grows unbounded
+        while len(lines) > 1 and len("\n".join(lines)) > MAX_SUMMARY_CHARS:
+            lines.pop(0)
+        self.summary = "\n".join(lines)[:MAX_SUMMARY_CHARS]
+
+    def update_risk(self, proposed_score, analysis: str = None) -> int:
+        """
+        Move the score toward the model's re-assessment, at most MAX_RISK_STEP
+        points per question, so one answer can't swing the decision wildly.
+        """
+        try:
+            target = int(proposed_score)
+        except (TypeError, ValueError):
+            return self.risk_score
+
+        target = max(0, min(100, target))
+        step = max(-MAX_RISK_STEP, min(MAX_RISK_STEP, target - self.risk_score))
+        self.risk_score += step
+
+        if analysis:
+            self.analysis = analysis
+        return self.risk_score
+
+    def build_messages(self, system_prompt: str, question: str) -> list:
+        """
+        Prompt layout: system rules, the fixed action context, the summary
+        (once turns have left the window), the recent window, then the new question.
+        """
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": self.context},
+        ]
+
+        if self.summary and self.turn_count > len(self.turns):
+            messages.append(
+                {
+                    "role": "user",
+                    "content": f"Summary of the call so far:\n{self.summary}",
+                }
+            )
+
+        for past_question, past_answer in self.turns:
+            messages.append({"role": "user", "content": past_question})
+            messages.append({"role": "assistant", "content": past_answer})
+
+        messages.append(
+            {
+                "role": "user",
+                "content": (
+                    f"Current Sentinel risk score: {self.risk_score}/100.\n"
+                    f"Current analysis: {self.analysis}\n\n"
+                    f'The approver now asks: "{question}"'
+                ),
+            }
+        )
+        return messages
+
+
+class ConversationStore:
+    """
+    Maps call_control_id -> CallConversation, bounded to MAX_ACTIVE_CALLS.
+    """
+
+    def __init__(self, max_calls: int = MAX_ACTIVE_CALLS):
+        self.max_calls = max_calls
+        self._calls = {}
+
+    def get(self, call_id: str):
+        return self._calls.get(call_id)
+
+    def start(self, call_id: str, context: str, risk_score: int, analysis: str):
+        conversation = CallConversation(call_id, context, risk_score, analysis)
+        self._calls.pop(call_id, None)
+        self._calls[call_id] = conversation
+        while len(self._calls) > self.max_calls:
+            # dicts keep insertion order, so the first key is the oldest call
+            self._calls.pop(next(iter(self._calls)))
+        return conversation
+
+    def end(self, call_id: str):
+        return self._calls.pop(call_id, None)
+
+    def clear(self):
+        self._calls.clear()
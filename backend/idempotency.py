@@ -0,0 +1,115 @@
+"""
+idempotency.py - Request Deduplication for /execute
+Agents retry on timeout. A retry carrying the same Idempotency-Key (or body
+request_id) either attaches to the request still in flight or gets the stored
+response back, so analysis and the voice call happen once.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# How long a completed response is replayable.
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("SENTINEL_IDEMPOTENCY_TTL", "600"))
+
+# Max completed responses kept; the oldest is evicted first.
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("SENTINEL_IDEMPOTENCY_MAX_ENTRIES", "10000"))
+
+# How long a duplicate waits on the in-flight original before answering
+# 409 IN_PROGRESS. Kept short: clients retry with the same key until they get
+# a final status, rather than holding a connection open for the whole analysis.
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("SENTINEL_IDEMPOTENCY_WAIT", "5"))
+
+
+class IdempotencyConflict(Exception):
+    """
+    Same key reused for a different request.
+    """
+
+
+def request_fingerprint(agent_id: str, action: str, payload, reasoning: str) -> str:
+    """
+    Canonical hash of everything that affects the decision, so a key can't be
+    reused to replay an approval for a different payload.
+    """
+    raw = json.dumps(
+        [agent_id, action, payload, reasoning],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(
+        self,
+        ttl: int = IDEMPOTENCY_TTL_SECONDS,
+        max_entries: int = IDEMPOTENCY_MAX_ENTRIES,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> (fingerprint, Future) for requests still running
+        self._inflight = {}
+        # key -> (expires_at, fingerprint, response); insertion order == expiry order
+        self._completed = OrderedDict()
+
+    def _purge_expired(self, now: float):
+        while self._completed:
+            key, (expires_at, _, _) = next(iter(self._completed.items()))
+            if expires_at > now:
+                break
+            self._completed.popitem(last=False)
+
+    def acquire(self, key: str, fingerprint):
+        """
+        Returns (future, leader).
+        - leader=True: first request for `key`; the caller runs it and must
+          call finish() so duplicates waiting on the future are released.
+        - leader=False: a duplicate; the future is already resolved with the
+          stored response, or resolves when the in-flight original finishes.
+        """
+        with self._lock:
+            self._purge_expired(time.time())
+
+            stored = self._completed.get(key)
+            if stored is not None:
+                _, stored_fingerprint, response = stored
+                if stored_fingerprint != fingerprint:
+                    raise IdempotencyConflict(key)
+                future = Future()
+                future.set_result(response)
+                return future, False
+
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                inflight_fingerprint, future = inflight
+                if inflight_fingerprint != fingerprint:
+                    raise IdempotencyConflict(key)
+                return future, False
+
+            future = Future()
+            self._inflight[key] = (fingerprint, future)
+            return future, True
+
+    def finish(self, key: str, response=None, error: Exception = None):
+        """
+        Resolve the leader's request. Failures are not stored, so a retry
+        after an error runs again.
+        """
+        with self._lock:
+            fingerprint, future = self._inflight.pop(key)
+            if error is None:
+                self._completed[key] = (time.time() + self.ttl, fingerprint, response)
+                while len(self._completed) > self.max_entries:
+                    self._completed.popitem(last=False)
+
+        if error is None:
+            future.set_result(response)
+        else:
+            future.set_exception(error)
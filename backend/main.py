@@ -1,32 +1,43 @@
 import os
 import json
+import uuid
+import asyncio
 import base64
-import requests
-import sentry_sdk
-from groq import Groq
-from fastapi import FastAPI, Request
+import threading
+from typing import Optional
+from fastapi import FastAPI, Header, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from dotenv import load_dotenv
 
+from clients import (
+    TELNYX_BASE_URL,
+    get_groq_client,
+    get_sentry,
+    get_telnyx_session,
+    warm_up,
+)
+from conversation import ConversationStore
+from idempotency import (
+    IDEMPOTENCY_WAIT_SECONDS,
+    IdempotencyConflict,
+    IdempotencyStore,
+    request_fingerprint,
+)
+from outbox import Outbox, start_replay_worker
+from payloads import PayloadSizeLimitMiddleware, normalize_payload
+from policy import HARD_BLOCK, VOICE_AUTH, apply_sentinel_policy
+from scheduler import ModuleBusy, ModuleScheduler
+
 load_dotenv()
 
 # --- CONFIGURATION ---
-SENTRY_DSN = "https://93f0c27a3a4f4a9b26fbbe83b2b3be6d@o4510413108477952.ingest.us.sentry.io/4510413862862848"
-
-TELNYX_API_KEY = os.getenv("TELNYX_API_KEY")
+# Sentry DSN, Groq and Telnyx HTTP clients live in clients.py and are built lazily.
 TELNYX_PHONE_NUMBER = os.getenv("TELNYX_PHONE_NUMBER")
 ADMIN_PHONE_NUMBER = os.getenv("ADMIN_PHONE_NUMBER")
 TELNYX_CONNECTION_ID = os.getenv("TELNYX_CONNECTION_ID", "2834931739384612416")
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-
-TELNYX_BASE_URL = "https://api.telnyx.com/v2"
-TELNYX_HEADERS = {
-    "Authorization": f"Bearer {TELNYX_API_KEY}",
-    "Content-Type": "application/json",
-}
-
 # --- GLOBAL STATE (Agent + Frontend Sync) ---
 # status:
 #   IDLE | ANALYZING | BLOCKED_AWAITING_AUTH | QNA_MODE | APPROVED | DECLINED
@@ -39,20 +50,88 @@ CURRENT_STATE = {
     "last_answer": None,
 }
 
-# Store last transaction so Groq can answer about it
+# Store last transaction so Groq can answer about it.
+# "id" is only set once the transaction is persisted as pending voice auth.
 LAST_TRANSACTION = {
+    "id": None,
     "action": None,
     "payload": None,
     "reasoning": None,
 }
 
-if SENTRY_DSN:
-    sentry_sdk.init(dsn=SENTRY_DSN, traces_sample_rate=1.0, send_default_pii=True)
+# Durable store for pending approvals + queued Telnyx actions (SQLite, WAL).
+# Opened by get_outbox() on first use (normally the startup hook), not at import.
+OUTBOX = None
+OUTBOX_WAKEUP = None
+
+# Completed / in-flight /execute responses keyed by Idempotency-Key
+IDEMPOTENCY = IdempotencyStore()
+
+# One bounded priority queue + worker pool per module (VaultKeeper, PrivacyShield, OpsGuard).
+# Worker threads start in get_scheduler() on first use (normally the startup hook).
+SCHEDULER = None
+
+# Per-call Q&A memory (sliding window + rolling summary), keyed by call_control_id
+CALL_CONVERSATIONS = ConversationStore()
+
+# Guards lazy construction of OUTBOX / SCHEDULER
+_init_lock = threading.Lock()
+
+
+def get_outbox() -> Outbox:
+    global OUTBOX
+    if OUTBOX is None:
+        with _init_lock:
+            if OUTBOX is None:
+                OUTBOX = Outbox()
+    return OUTBOX
+
+
+def get_scheduler() -> ModuleScheduler:
+    global SCHEDULER
+    if SCHEDULER is None:
+        with _init_lock:
+            if SCHEDULER is None:
+                SCHEDULER = ModuleScheduler()
+    return SCHEDULER
 
-groq_client = Groq(api_key=GROQ_API_KEY)
 
 app = FastAPI()
 
+
+@app.on_event("startup")
+def start_warm_up():
+    # Sentry first, synchronously, so errors during startup are captured
+    try:
+        get_sentry()
+    except Exception as e:
+        print(f"⚠️ [SENTRY] Init failed: {e}")
+
+    # Pre-open Groq / Telnyx in the background; the first request still
+    # works (just slower) if it lands before warm-up finishes.
+    warm_up()
+
+
+@app.on_event("startup")
+def start_scheduler():
+    # Start the module worker pools before the first /execute arrives
+    get_scheduler()
+
+
+@app.on_event("startup")
+def start_outbox_replay():
+    # Restore any approval that was pending when the last process died, then
+    # keep retrying queued Telnyx actions in the background.
+    global OUTBOX_WAKEUP
+    outbox = get_outbox()
+    outbox.recover()
+    restore_pending_transaction()
+    OUTBOX_WAKEUP = start_replay_worker(outbox, deliver_call_action)
+
+# Reject oversized bodies (SENTINEL_MAX_REQUEST_BYTES) before they are parsed.
+# Added before CORS so CORS wraps it and the 413 still carries CORS headers.
+app.add_middleware(PayloadSizeLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -64,8 +143,11 @@ app.add_middleware(
 class ActionRequest(BaseModel):
     agent_id: str
     action: str
+    # Raw payload; normalized into a typed, size-capped schema in payloads.py
     payload: dict
     reasoning: str
+    # Optional client-supplied id; same role as the Idempotency-Key header
+    request_id: Optional[str] = None
 
 
 # ---------------------------------------------------------------------
@@ -114,7 +196,7 @@ def analyze_risk_with_groq(action, payload, reasoning):
         }}
         """
 
-        response = groq_client.chat.completions.create(
+        response = get_groq_client().chat.completions.create(
             model="llama-3.3-70b-versatile",
             messages=[
                 {
@@ -140,62 +222,101 @@ def analyze_risk_with_groq(action, payload, reasoning):
 # ---------------------------------------------------------------------
 
 
-def answer_risk_question_with_groq(question: str):
-    print(f"🧠 [GROQ Q&A] Question: {question}")
-    try:
-        context = f"""
-        Current action:
-        - Type: {LAST_TRANSACTION.get('action')}
-        - Payload: {json.dumps(LAST_TRANSACTION.get('payload'))}
-        - Agent reasoning: {LAST_TRANSACTION.get('reasoning')}
-        - Sentinel risk score: {CURRENT_STATE.get('risk_score')}
-        - Sentinel analysis: {CURRENT_STATE.get('analysis')}
-        """
+QNA_SYSTEM_PROMPT = """
+You are Sentinel, a security copilot speaking to a human approver over the phone.
+They just received a real-time alert about a risky autonomous agent action.
+
+Answer rules:
+- Speak in a calm, confident tone.
+- Use 2–4 short sentences.
+- Start with a direct answer to their question.
+- Reference specifics: amount, vendor, number of records, environment
+  (prod vs staging), or destructive potential (DROP_TABLE, deleting privileged users).
+- Build on what was already discussed on this call instead of repeating yourself.
+- Briefly explain what could go wrong if this is approved.
+- End with a recommendation like "I would only approve this after..."
+  or "This looks safe enough to approve without extra checks."
+- Do NOT mention JSON, prompts, models, or that you're an AI in the answer.
+
+After answering, re-assess the risk using everything learned on the call so far.
+
+Return STRICT JSON with exactly these keys:
+{
+  "answer": "<the words you would say out loud>",
+  "risk_score": <integer between 0 and 100>,
+  "analysis": "<1-2 sentence updated risk explanation>",
+  "summary": "<2-4 sentence running summary of the whole call so far, including this question: what the approver asked about and what was established>"
+}
+"""
 
-        prompt = f"""
-        You are Sentinel, a security copilot speaking to a human approver over the phone.
-        They just received a real-time alert about a risky autonomous agent action.
-
-        Context for the action:
-        {context}
-
-        The human asked you: "{question}"
-
-        Answer rules:
-        - Speak in a calm, confident tone.
-        - Use 2–4 short sentences.
-        - Start with a direct answer to their question.
-        - Reference specifics: amount, vendor, number of records, environment
-          (prod vs staging), or destructive potential (DROP_TABLE, deleting privileged users).
-        - Briefly explain what could go wrong if this is approved.
-        - End with a recommendation like "I would only approve this after..."
-          or "This looks safe enough to approve without extra checks."
-        - Do NOT mention JSON, prompts, models, or that you're an AI.
-
-        Return ONLY the words you would say out loud.
-        """
 
-        response = groq_client.chat.completions.create(
+def build_qna_context():
+    """
+    Static description of the action under review. Rendered once per call and
+    reused by every Q&A turn.
+    """
+    return f"""
+    Context for the action:
+    - Type: {LAST_TRANSACTION.get('action')}
+    - Payload: {json.dumps(LAST_TRANSACTION.get('payload'))}
+    - Agent reasoning: {LAST_TRANSACTION.get('reasoning')}
+    - Initial Sentinel risk score: {CURRENT_STATE.get('risk_score')}
+    - Initial Sentinel analysis: {CURRENT_STATE.get('analysis')}
+    """
+
+
+def get_or_start_conversation(call_id: str):
+    conversation = CALL_CONVERSATIONS.get(call_id)
+    if conversation is None:
+        conversation = CALL_CONVERSATIONS.start(
+            call_id,
+            build_qna_context(),
+            CURRENT_STATE.get("risk_score", 0),
+            CURRENT_STATE.get("analysis", ""),
+        )
+    return conversation
+
+
+def answer_risk_question_with_groq(call_id: str, question: str):
+    """
+    Answer a spoken question using the call's conversation buffer, then fold the
+    model's re-assessment back into the stored risk score and analysis.
+    """
+    print(f"🧠 [GROQ Q&A] Question: {question}")
+    conversation = get_or_start_conversation(call_id)
+    try:
+        response = get_groq_client().chat.completions.create(
             model="llama-3.3-70b-versatile",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are Sentinel speaking over the phone. Answer in 2–4 sentences, no JSON.",
-                },
-                {"role": "user", "content": prompt},
-            ],
+            messages=conversation.build_messages(QNA_SYSTEM_PROMPT, question),
+            response_format={"type": "json_object"},
             temperature=0.3,
         )
-        answer = response.choices[0].message.content.strip()
+        result = json.loads(response.choices[0].message.content)
+        answer = str(result.get("answer") or "").strip()
+        if not answer:
+            raise ValueError("empty answer")
+
+        previous_score = conversation.risk_score
+        risk_score = conversation.update_risk(
+            result.get("risk_score"), result.get("analysis")
+        )
+        conversation.add_turn(question, answer, result.get("summary"))
+
+        CURRENT_STATE["risk_score"] = risk_score
+        CURRENT_STATE["analysis"] = conversation.analysis
+        persist_pending(wait=False)
         print(f"🧠 [GROQ Q&A] Answer: {answer}")
+        print(f"📈 [RISK] Re-scored during Q&A: {previous_score} -> {risk_score}")
         return answer
     except Exception as e:
         print(f"❌ Groq Error (Q&A): {e}")
-        return (
+        answer = (
             "I'm having trouble with my deeper analysis right now, but based on the details, "
             "this still looks like a high-risk action. I would avoid approving it until you "
             "verify the vendor and double-check the impact."
         )
+        conversation.add_turn(question, answer)
+        return answer
 
 
 # ---------------------------------------------------------------------
@@ -204,16 +325,84 @@ def answer_risk_question_with_groq(question: str):
 
 
 def telnyx_post(path, payload):
+    """
+    Record the call-control request in the outbox, then send it. If an earlier
+    action for the same call is still pending, this one is left queued and the
+    replay worker sends them in order.
+    """
+    entry_id, body, status = get_outbox().enqueue_call_action(path, payload)
+    if status == "queued":
+        print(f"📥 [OUTBOX] Queued POST {path} behind an earlier action for this call")
+        if OUTBOX_WAKEUP is not None:
+            OUTBOX_WAKEUP.set()
+        return None
+    return deliver_call_action(entry_id, path, body)
+
+
+def deliver_call_action(entry_id, path, payload):
     url = f"{TELNYX_BASE_URL}{path}"
     try:
         print(f"📡 [TELNYX] POST {url} -> {payload}")
-        r = requests.post(url, headers=TELNYX_HEADERS, json=payload)
+        r = get_telnyx_session().post(url, json=payload)
         print(f"📡 [TELNYX] Response {r.status_code}: {r.text}")
-        return r
     except Exception as e:
         print(f"❌ [TELNYX] Error POST {url}: {e}")
+        get_outbox().mark_failed(entry_id, str(e))
         return None
 
+    if r.ok:
+        get_outbox().mark_sent(entry_id)
+    else:
+        # Only throttling / server errors are worth retrying
+        retryable = r.status_code == 429 or r.status_code >= 500
+        get_outbox().mark_failed(entry_id, f"HTTP {r.status_code}: {r.text}", retryable)
+    return r
+
+
+# ---------------------------------------------------------------------
+#  PENDING APPROVAL PERSISTENCE
+# ---------------------------------------------------------------------
+
+
+def persist_pending(wait=True):
+    """
+    Mirror status / score of the transaction awaiting voice auth to the outbox.
+    No-op for transactions that never needed approval.
+    """
+    txn_id = LAST_TRANSACTION.get("id")
+    if txn_id:
+        get_outbox().update_pending(
+            txn_id,
+            CURRENT_STATE["status"],
+            CURRENT_STATE.get("risk_score"),
+            CURRENT_STATE.get("analysis"),
+            wait=wait,
+        )
+
+
+def set_status(status):
+    CURRENT_STATE["status"] = status
+    persist_pending()
+
+
+def restore_pending_transaction():
+    pending = get_outbox().load_pending()
+    if pending is None:
+        return
+
+    LAST_TRANSACTION["id"] = pending["id"]
+    LAST_TRANSACTION["action"] = pending["action"]
+    LAST_TRANSACTION["payload"] = pending["payload"]
+    LAST_TRANSACTION["reasoning"] = pending["reasoning"]
+
+    CURRENT_STATE["status"] = pending["status"]
+    CURRENT_STATE["risk_score"] = pending["risk_score"]
+    CURRENT_STATE["analysis"] = pending["analysis"]
+    print(
+        f"♻️ [OUTBOX] Restored pending {pending['action']} ({pending['status']}) "
+        f"from before restart"
+    )
+
 
 def trigger_voice_auth():
     """
@@ -338,8 +527,128 @@ def get_status():
     return CURRENT_STATE
 
 
+@app.get("/api/sentinel/metrics")
+def get_metrics():
+    # Per-module queue depth, concurrency and wait times
+    return get_scheduler().metrics()
+
+
+MODULE_BUSY_RESPONSE = {
+    "status": "MODULE_BUSY",
+    "analysis": "Sentinel is at capacity for this module. Retry shortly.",
+}
+
+
+def submit_action(request: ActionRequest):
+    """
+    Queue process_action on the action's module executor (scheduler.py).
+    Returns its concurrent Future; raises ModuleBusy when the queue is full.
+    """
+    future, module, priority = get_scheduler().submit(
+        request.action, request.payload, lambda: process_action(request)
+    )
+    print(f"🧵 [SCHEDULER] {request.action} queued on {module} ({priority})")
+    return future
+
+
+async def schedule_action(request: ActionRequest):
+    """
+    Run process_action on its module executor and await it without holding a
+    server thread while it is queued.
+    """
+    return await asyncio.wrap_future(submit_action(request))
+
+
+def finish_idempotent(key: str, work):
+    """
+    Done-callback for a leader's scheduled work: store the real outcome even if
+    the leader's own request went away. Fails the key only when the work was
+    cancelled before it started.
+    """
+    if work.cancelled():
+        IDEMPOTENCY.finish(key, error=RuntimeError("original request was cancelled"))
+    elif work.exception() is not None:
+        IDEMPOTENCY.finish(key, error=work.exception())
+    else:
+        IDEMPOTENCY.finish(key, work.result())
+
+
 @app.post("/api/sentinel/execute")
-def execute_action(request: ActionRequest):
+async def execute_action(
+    request: ActionRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """
+    Retries with the same Idempotency-Key header (or body request_id) from the
+    same agent attach to the in-flight request or replay its stored response,
+    instead of re-running analysis and placing another call.
+    """
+    key = idempotency_key or request.request_id
+    if not key:
+        try:
+            return await schedule_action(request)
+        except ModuleBusy:
+            return JSONResponse(status_code=503, content=MODULE_BUSY_RESPONSE)
+
+    scoped_key = f"{request.agent_id}:{key}"
+    try:
+        future, leader = IDEMPOTENCY.acquire(
+            scoped_key,
+            request_fingerprint(
+                request.agent_id, request.action, request.payload, request.reasoning
+            ),
+        )
+    except IdempotencyConflict:
+        return JSONResponse(
+            status_code=422,
+            content={
+                "status": "IDEMPOTENCY_CONFLICT",
+                "analysis": "Idempotency key was already used for a different request.",
+            },
+        )
+
+    if leader:
+        try:
+            work = submit_action(request)
+        except Exception as e:
+            IDEMPOTENCY.finish(scoped_key, error=e)
+            if isinstance(e, ModuleBusy):
+                return JSONResponse(status_code=503, content=MODULE_BUSY_RESPONSE)
+            raise
+        # If this request is cancelled, wrap_future() tries to cancel `work`;
+        # that only succeeds while it is still queued. Once process_action has
+        # started, the call goes ahead and the callback records its result.
+        work.add_done_callback(lambda done: finish_idempotent(scoped_key, done))
+        try:
+            return await asyncio.wrap_future(work)
+        except ModuleBusy:
+            # Evicted from the queue by higher-priority work
+            return JSONResponse(status_code=503, content=MODULE_BUSY_RESPONSE)
+
+    try:
+        # shield(): a duplicate timing out must not cancel the shared future
+        result = await asyncio.wait_for(
+            asyncio.shield(asyncio.wrap_future(future)), IDEMPOTENCY_WAIT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        return JSONResponse(
+            status_code=409,
+            content={
+                "status": "IN_PROGRESS",
+                "analysis": "The original request with this idempotency key is still running.",
+            },
+            headers={"Retry-After": "2"},
+        )
+    except ModuleBusy:
+        return JSONResponse(status_code=503, content=MODULE_BUSY_RESPONSE)
+
+    print(f"♻️ [IDEMPOTENCY] Replayed response for key {key}")
+    response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+def process_action(request: ActionRequest):
     """
     Entry point from:
       - agent.py (VaultKeeper / PAY_INVOICE)
@@ -355,65 +664,66 @@ def execute_action(request: ActionRequest):
     """
     global CURRENT_STATE, LAST_TRANSACTION
 
+    sentry_sdk = get_sentry()
+
+    # A new action replaces whatever was waiting on voice auth
+    if LAST_TRANSACTION.get("id"):
+        get_outbox().supersede_pending(LAST_TRANSACTION["id"])
+        LAST_TRANSACTION["id"] = None
+
+    # Summarize record lists / long strings and validate the action's schema
+    # before anything is scored, logged or sent to Groq.
+    try:
+        typed_payload = normalize_payload(request.action, request.payload)
+        payload = typed_payload.model_dump()
+    except ValidationError as e:
+        analysis = f"Malformed payload for {request.action}: {e.error_count()} invalid field(s)."
+        print(f"❌ [PAYLOAD] {analysis}")
+        CURRENT_STATE["status"] = "DECLINED"
+        CURRENT_STATE["risk_score"] = 100
+        CURRENT_STATE["analysis"] = analysis
+        return {
+            "status": "DECLINED",
+            "risk_score": 100,
+            "analysis": analysis,
+        }
+
     LAST_TRANSACTION["action"] = request.action
-    LAST_TRANSACTION["payload"] = request.payload
+    LAST_TRANSACTION["payload"] = payload
     LAST_TRANSACTION["reasoning"] = request.reasoning
 
     CURRENT_STATE["status"] = "ANALYZING"
     CURRENT_STATE["last_digit"] = None
     CURRENT_STATE["last_question"] = None
     CURRENT_STATE["last_answer"] = None
+    CALL_CONVERSATIONS.clear()
 
     with sentry_sdk.start_transaction(
         op="agent.action", name=f"Execute {request.action}"
     ) as span:
-        span.set_data("payload", request.payload)
+        span.set_data("payload", payload)
 
         # 1) Ask Groq for baseline risk
         risk_score, analysis = analyze_risk_with_groq(
-            request.action, request.payload, request.reasoning
+            request.action, payload, request.reasoning
         )
 
         action = request.action
-        payload = request.payload or {}
         agent_id = request.agent_id
 
-        # Extract common fields for bucketing
-        amount = float(payload.get("amount", 0) or 0)
-        vendor = str(payload.get("vendor", "") or "")
-        record_count = int(payload.get("record_count", 0) or 0)
-        contains_pii = bool(payload.get("contains_pii", False))
-        environment = str(payload.get("environment", "") or "").lower()
+        # 2) Module rules, detected PII and demo bucketing (policy.py)
+        pii_report = getattr(typed_payload, "pii", None)
+        if pii_report is not None:
+            span.set_data("pii_scan_ms", round(pii_report.scan_ms, 1))
 
-        # ------------------------------------------------------------------
-        # Module-specific policies (B & C)
-        # ------------------------------------------------------------------
+        result = apply_sentinel_policy(
+            action, payload, agent_id, risk_score, analysis, pii_report
+        )
+        risk_score = result["risk_score"]
+        analysis = result["analysis"]
 
-        # --- Module B: PrivacyShield (Data) ---
-        # EXPORT_CSV / SHARE_RECORD / QUERY_SSN
-        if action == "EXPORT_CSV":
-            if record_count > 10 or contains_pii:
-                risk_score = max(risk_score, 95)
-                analysis = (
-                    f"PrivacyShield: bulk export of {record_count} records "
-                    "with personal data creates a high risk of data exfiltration."
-                )
-        elif action in ("SHARE_RECORD", "QUERY_SSN"):
-            if contains_pii:
-                risk_score = max(risk_score, 90)
-                analysis = (
-                    "PrivacyShield: accessing or sharing SSN/PII is restricted and should "
-                    "only be done with strong justification and approval."
-                )
-
-        # --- Module C: OpsGuard (Infrastructure) ---
-        if action == "DROP_TABLE":
-            # Hard block
-            risk_score = 100
-            analysis = (
-                "OpsGuard: DROP_TABLE is hard blocked to prevent destructive schema changes "
-                "in critical environments."
-            )
+        # --- Module C: OpsGuard hard block ---
+        if result["decision"] == HARD_BLOCK:
             CURRENT_STATE["risk_score"] = risk_score
             CURRENT_STATE["analysis"] = analysis
             CURRENT_STATE["status"] = "DECLINED"
@@ -426,51 +736,6 @@ def execute_action(request: ActionRequest):
                 "analysis": analysis,
             }
 
-        if action == "DELETE_USER":
-            # Default: high risk & voice auth, demo bucketing may adjust score
-            risk_score = max(risk_score, 70)
-            analysis = (
-                "OpsGuard: deleting user accounts, especially privileged ones, should not be "
-                "performed autonomously by agents."
-            )
-
-        # ------------------------------------------------------------------
-        # DEMO BUCKETING: 1 very high, 2 medium, 3 low
-        # ------------------------------------------------------------------
-
-        # 1) Very high risk – AGI big unknown payment
-        if (
-            action == "PAY_INVOICE"
-            and agent_id.startswith("session_")
-            and amount >= 5000
-            and vendor == "Unknown Corp"
-        ):
-            risk_score = 95
-
-        # 2) Medium risk – PrivacyShield export
-        elif action == "EXPORT_CSV" and 50 <= record_count <= 500 and not contains_pii:
-            risk_score = 65
-
-        # 3) Medium risk – OpsGuard delete in prod
-        elif action == "DELETE_USER" and environment == "production":
-            risk_score = 70
-
-        # 4) Low risk – small trusted payment
-        elif (
-            action == "PAY_INVOICE"
-            and amount <= 1000
-            and vendor in ["Trusted SaaS Inc", "AWS", "Stripe"]
-        ):
-            risk_score = 10
-
-        # 5) Low risk – tiny CSV, no PII
-        elif action == "EXPORT_CSV" and record_count <= 10 and not contains_pii:
-            risk_score = 15
-
-        # 6) Low risk – restart in staging/dev
-        elif action == "RESTART_SERVER" and environment in ["staging", "dev"]:
-            risk_score = 20
-
         # ------------------------------------------------------------------
         # Persist state + decide on voice auth vs auto-approve
         # ------------------------------------------------------------------
@@ -483,14 +748,27 @@ def execute_action(request: ActionRequest):
             f"🔎 [RISK] Action={action}, Agent={agent_id}, Score={risk_score}, Analysis={analysis}"
         )
 
-        # Voice auth for anything above 50 that wasn't hard-blocked
-        if risk_score > 50:
+        # Voice auth for anything above the threshold that wasn't hard-blocked
+        if result["decision"] == VOICE_AUTH:
             sentry_sdk.set_tag("risk", "HIGH")
             CURRENT_STATE["status"] = "BLOCKED_AWAITING_AUTH"
 
+            # Durable before dialing, so a restart mid-call keeps the approval
+            LAST_TRANSACTION["id"] = str(uuid.uuid4())
+            get_outbox().save_pending(
+                LAST_TRANSACTION["id"],
+                agent_id,
+                action,
+                payload,
+                request.reasoning,
+                risk_score,
+                analysis,
+                CURRENT_STATE["status"],
+            )
+
             ok = trigger_voice_auth()
             if not ok:
-                CURRENT_STATE["status"] = "DECLINED"
+                set_status("DECLINED")
                 return {
                     "status": "ERROR_TELNYX",
                     "risk_score": risk_score,
@@ -525,6 +803,7 @@ async def telnyx_webhook(request: Request):
       - call.answered       -> speak summary + menu (1 approve, 2 Q&A)
       - call.dtmf.received  -> 1 = approve, 2 = enter Q&A mode
       - call.gather.ended   -> handle spoken Q&A (if speech is enabled)
+      - call.hangup         -> drop the call's Q&A conversation buffer
     """
     global CURRENT_STATE
 
@@ -564,7 +843,7 @@ async def telnyx_webhook(request: Request):
         if digit == "1":
             # APPROVE
             print("✅ [AUTH] Approved via DTMF 1")
-            CURRENT_STATE["status"] = "APPROVED"
+            set_status("APPROVED")
 
             telnyx_post(
                 f"/calls/{call_id}/actions/speak",
@@ -579,7 +858,8 @@ async def telnyx_webhook(request: Request):
         elif digit == "2":
             # ENTER Q&A MODE
             print("🗣️ [Q&A] Entering conversational mode")
-            CURRENT_STATE["status"] = "QNA_MODE"
+            set_status("QNA_MODE")
+            get_or_start_conversation(call_id)
             start_speech_question_gather(call_id)
 
         else:
@@ -632,7 +912,7 @@ async def telnyx_webhook(request: Request):
             return {"status": "ok"}
 
         if "approve" in lower_q and "not" not in lower_q:
-            CURRENT_STATE["status"] = "APPROVED"
+            set_status("APPROVED")
             telnyx_post(
                 f"/calls/{call_id}/actions/speak",
                 {
@@ -645,7 +925,7 @@ async def telnyx_webhook(request: Request):
             return {"status": "ok"}
 
         if "decline" in lower_q or "block" in lower_q or "reject" in lower_q:
-            CURRENT_STATE["status"] = "DECLINED"
+            set_status("DECLINED")
             telnyx_post(
                 f"/calls/{call_id}/actions/speak",
                 {
@@ -658,12 +938,17 @@ async def telnyx_webhook(request: Request):
             return {"status": "ok"}
 
         # Use Groq to answer the question
-        answer = answer_risk_question_with_groq(question_text)
+        answer = answer_risk_question_with_groq(call_id, question_text)
         CURRENT_STATE["last_answer"] = answer
 
         # Speak answer & loop
         speak_and_loop_question(call_id, answer)
 
+    # --- 4) CALL HANGUP ---
+    elif event_type == "call.hangup":
+        if CALL_CONVERSATIONS.end(call_id):
+            print("🧹 [Q&A] Call ended, dropped conversation buffer")
+
     else:
         print(f"ℹ️ [WEBHOOK] Unhandled event type: {event_type}")
 
@@ -0,0 +1,460 @@
+"""
+outbox.py - Durable Outbox
+SQLite (WAL mode) store for the two things Sentinel can't afford to lose on a
+restart: the transaction waiting on voice approval, and queued Telnyx
+call-control actions (dial, speak, gather, hangup).
+
+All writes go through one writer thread that group-commits whatever is queued
+in a single transaction, so concurrent requests share one fsync.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+OUTBOX_PATH = os.getenv(
+    "SENTINEL_OUTBOX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "sentinel_outbox.db"),
+)
+
+# Most writes folded into one commit.
+GROUP_COMMIT_MAX = 128
+
+# Call-control retries: attempts, backoff cap and how long an action stays useful.
+MAX_ATTEMPTS = 5
+MAX_BACKOFF_SECONDS = 30
+MAX_ACTION_AGE_SECONDS = int(os.getenv("SENTINEL_OUTBOX_MAX_AGE", "300"))
+
+# A pending approval older than this can't resume its call; it is declined
+# instead of restored after a restart.
+MAX_PENDING_AGE_SECONDS = int(os.getenv("SENTINEL_PENDING_MAX_AGE", "900"))
+
+# Finished rows (sent / dead actions, resolved approvals with their payloads)
+# are deleted once they are this old. The replay worker purges every PURGE_INTERVAL_SECONDS.
+RETENTION_SECONDS = int(os.getenv("SENTINEL_OUTBOX_RETENTION", str(24 * 3600)))
+PURGE_INTERVAL_SECONDS = 600
+
+# Call-action lifecycle:
+#   queued  -> not yet attempted, or failed and waiting for a retry
+#   sending -> request in flight (durable before it leaves the process)
+#   sent    -> Telnyx accepted it
+#   dead    -> gave up (non-retryable error, too old, failed dial, or unknown outcome)
+
+# Pending transactions in these states no longer need a human.
+RESOLVED_STATUSES = ("APPROVED", "DECLINED", "SUPERSEDED")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_transactions (
+    id          TEXT PRIMARY KEY,
+    agent_id    TEXT,
+    action      TEXT,
+    payload     TEXT,
+    reasoning   TEXT,
+    risk_score  INTEGER,
+    analysis    TEXT,
+    status      TEXT NOT NULL,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS call_actions (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    call_id         TEXT,
+    path            TEXT NOT NULL,
+    body            TEXT NOT NULL,
+    idempotent      INTEGER NOT NULL,
+    status          TEXT NOT NULL,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    last_error      TEXT,
+    created_at      REAL NOT NULL,
+    next_attempt_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS call_actions_due ON call_actions (status, next_attempt_at);
+"""
+
+
+def call_id_from_path(path: str):
+    """
+    "/calls/<id>/actions/speak" -> "<id>"; the dial endpoint "/calls" -> None.
+    """
+    parts = path.strip("/").split("/")
+    if len(parts) >= 3 and parts[0] == "calls" and parts[2] == "actions":
+        return parts[1]
+    return None
+
+
+class Outbox:
+    def __init__(self, path: str = OUTBOX_PATH):
+        self.path = path
+        self._queue = queue.Queue()
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(SCHEMA)
+        self._writer = threading.Thread(
+            target=self._write_loop, name="sentinel-outbox", daemon=True
+        )
+        self._writer.start()
+
+    # -----------------------------------------------------------------
+    #  Group commit
+    # -----------------------------------------------------------------
+
+    def _submit(self, fn, wait: bool = True):
+        future = Future()
+        self._queue.put((fn, future))
+        return future.result() if wait else future
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < GROUP_COMMIT_MAX:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if any(item is None for item in batch):
+                batch = [item for item in batch if item is not None]
+                stop = True
+            else:
+                stop = False
+
+            results = []
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                for fn, _ in batch:
+                    # Savepoint per write so one bad write doesn't sink the batch
+                    self._conn.execute("SAVEPOINT op")
+                    try:
+                        results.append((fn(self._conn), None))
+                        self._conn.execute("RELEASE op")
+                    except Exception as e:
+                        self._conn.execute("ROLLBACK TO op")
+                        self._conn.execute("RELEASE op")
+                        results.append((None, e))
+                self._conn.execute("COMMIT")
+            except Exception as e:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                results = [(None, e)] * len(batch)
+
+            for (_, future), (result, error) in zip(batch, results):
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+            if stop:
+                return
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join()
+        self._conn.close()
+
+    # -----------------------------------------------------------------
+    #  Pending approvals
+    # -----------------------------------------------------------------
+
+    def save_pending(self, txn_id, agent_id, action, payload, reasoning,
+                     risk_score, analysis, status):
+        now = time.time()
+
+        def write(conn):
+            conn.execute(
+                "INSERT OR REPLACE INTO pending_transactions "
+                "(id, agent_id, action, payload, reasoning, risk_score, analysis, "
+                " status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (txn_id, agent_id, action, json.dumps(payload), reasoning,
+                 risk_score, analysis, status, now, now),
+            )
+
+        self._submit(write)
+
+    def update_pending(self, txn_id, status, risk_score=None, analysis=None, wait=True):
+        def write(conn):
+            conn.execute(
+                "UPDATE pending_transactions SET status = ?, "
+                "risk_score = COALESCE(?, risk_score), analysis = COALESCE(?, analysis), "
+                "updated_at = ? WHERE id = ?",
+                (status, risk_score, analysis, time.time(), txn_id),
+            )
+
+        return self._submit(write, wait=wait)
+
+    def supersede_pending(self, txn_id):
+        """
+        A newer /execute replaced this transaction; stop restoring it.
+        """
+        placeholders = ",".join("?" * len(RESOLVED_STATUSES))
+
+        def write(conn):
+            conn.execute(
+                "UPDATE pending_transactions SET status = 'SUPERSEDED', updated_at = ? "
+                f"WHERE id = ? AND status NOT IN ({placeholders})",
+                (time.time(), txn_id, *RESOLVED_STATUSES),
+            )
+
+        return self._submit(write, wait=False)
+
+    def load_pending(self, max_age: float = MAX_PENDING_AGE_SECONDS):
+        """
+        Most recent transaction still waiting on a human, as a dict (or None).
+        Unresolved ones older than `max_age` are declined first: their call is
+        long gone, so restoring them would block the UI with nothing to answer.
+        """
+        placeholders = ",".join("?" * len(RESOLVED_STATUSES))
+        now = time.time()
+
+        def read(conn):
+            conn.execute(
+                "UPDATE pending_transactions SET status = 'DECLINED', "
+                "analysis = 'Voice approval expired before a decision was made.', "
+                f"updated_at = ? WHERE status NOT IN ({placeholders}) AND created_at < ?",
+                (now, *RESOLVED_STATUSES, now - max_age),
+            )
+            row = conn.execute(
+                "SELECT * FROM pending_transactions "
+                f"WHERE status NOT IN ({placeholders}) "
+                "ORDER BY created_at DESC LIMIT 1",
+                RESOLVED_STATUSES,
+            ).fetchone()
+            if row is None:
+                return None
+            pending = dict(row)
+            pending["payload"] = json.loads(pending["payload"] or "null")
+            return pending
+
+        return self._submit(read)
+
+    # -----------------------------------------------------------------
+    #  Call-control actions
+    # -----------------------------------------------------------------
+
+    def enqueue_call_action(self, path: str, body: dict, send_now: bool = True):
+        """
+        Durably record a Telnyx call-control request before it is sent.
+
+        Actions on an existing call get a command_id, which Telnyx uses to drop
+        duplicates, so they are safe to resend after a crash. Returns
+        (entry_id, body, status); status is "sending" when the caller may send
+        it right away, or "queued" when an earlier action for the same call is
+        still waiting and this one has to go out after it.
+        """
+        call_id = call_id_from_path(path)
+        body = dict(body)
+        idempotent = call_id is not None
+        if idempotent:
+            body.setdefault("command_id", f"sentinel-{uuid.uuid4()}")
+        now = time.time()
+
+        def write(conn):
+            status = "sending" if send_now else "queued"
+            if status == "sending" and call_id is not None:
+                blocked = conn.execute(
+                    "SELECT 1 FROM call_actions WHERE call_id = ? "
+                    "AND status IN ('queued', 'sending') LIMIT 1",
+                    (call_id,),
+                ).fetchone()
+                if blocked:
+                    status = "queued"
+            cursor = conn.execute(
+                "INSERT INTO call_actions "
+                "(call_id, path, body, idempotent, status, attempts, created_at, next_attempt_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (call_id, path, json.dumps(body), int(idempotent), status,
+                 1 if status == "sending" else 0, now, now),
+            )
+            return cursor.lastrowid, status
+
+        entry_id, status = self._submit(write)
+        return entry_id, body, status
+
+    def claim(self, entry_id: int):
+        """
+        Move a queued action to "sending" (counting the attempt). False if it
+        was already claimed or finished.
+        """
+
+        def write(conn):
+            cursor = conn.execute(
+                "UPDATE call_actions SET status = 'sending', attempts = attempts + 1 "
+                "WHERE id = ? AND status = 'queued'",
+                (entry_id,),
+            )
+            return cursor.rowcount == 1
+
+        return self._submit(write)
+
+    def mark_sent(self, entry_id: int):
+        # Not waited on: if this write is lost in a crash, replay resends an
+        # idempotent action (deduped by command_id) or drops a dial.
+        def write(conn):
+            conn.execute("UPDATE call_actions SET status = 'sent' WHERE id = ?", (entry_id,))
+
+        return self._submit(write, wait=False)
+
+    def mark_failed(self, entry_id: int, error: str, retryable: bool = True):
+        """
+        Requeue a failed action with backoff, or mark it dead. A failed dial is
+        always dead: a timeout or 5xx may still have placed the call, and it
+        has no command_id for Telnyx to dedupe a resend.
+        """
+        now = time.time()
+
+        def write(conn):
+            row = conn.execute(
+                "SELECT attempts, created_at, idempotent FROM call_actions WHERE id = ?",
+                (entry_id,),
+            ).fetchone()
+            if row is None:
+                return
+            give_up = (
+                not retryable
+                or not row["idempotent"]
+                or row["attempts"] >= MAX_ATTEMPTS
+                or now - row["created_at"] > MAX_ACTION_AGE_SECONDS
+            )
+            backoff = min(MAX_BACKOFF_SECONDS, 2 ** row["attempts"])
+            conn.execute(
+                "UPDATE call_actions SET status = ?, last_error = ?, next_attempt_at = ? "
+                "WHERE id = ?",
+                ("dead" if give_up else "queued", error[:500], now + backoff, entry_id),
+            )
+
+        return self._submit(write, wait=False)
+
+    def recover(self):
+        """
+        Run once at startup. Actions left "sending" by a crashed process are
+        requeued when idempotent; a dial with an unknown outcome is dropped
+        rather than risk ringing the approver twice.
+        """
+
+        def write(conn):
+            conn.execute(
+                "UPDATE call_actions SET status = 'queued' "
+                "WHERE status = 'sending' AND idempotent = 1"
+            )
+            conn.execute(
+                "UPDATE call_actions SET status = 'dead', "
+                "last_error = 'outcome unknown after restart' "
+                "WHERE status = 'sending' AND idempotent = 0"
+            )
+
+        self._submit(write)
+
+    def due_actions(self, limit: int = 100):
+        """
+        Queued actions ready for (re)delivery, oldest first. Actions past
+        MAX_ACTION_AGE_SECONDS are marked dead instead of returned.
+        """
+        now = time.time()
+
+        def read(conn):
+            conn.execute(
+                "UPDATE call_actions SET status = 'dead', last_error = 'expired' "
+                "WHERE status = 'queued' AND created_at < ?",
+                (now - MAX_ACTION_AGE_SECONDS,),
+            )
+            # Per call, only the oldest unfinished action is eligible, so a
+            # retried speak can't be overtaken by the hangup queued after it.
+            rows = conn.execute(
+                "SELECT id, call_id, path, body FROM call_actions AS a "
+                "WHERE status = 'queued' AND next_attempt_at <= ? "
+                "AND NOT EXISTS (SELECT 1 FROM call_actions AS e "
+                "    WHERE e.call_id = a.call_id AND e.id < a.id "
+                "    AND e.status IN ('queued', 'sending')) "
+                "ORDER BY id LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            return [
+                {
+                    "id": r["id"],
+                    "call_id": r["call_id"],
+                    "path": r["path"],
+                    "body": json.loads(r["body"]),
+                }
+                for r in rows
+            ]
+
+        return self._submit(read)
+
+    # -----------------------------------------------------------------
+    #  Retention
+    # -----------------------------------------------------------------
+
+    def purge(self, retention: float = RETENTION_SECONDS):
+        """
+        Delete finished call actions and resolved approvals older than
+        `retention`. Returns (actions_deleted, approvals_deleted).
+        """
+        cutoff = time.time() - retention
+        placeholders = ",".join("?" * len(RESOLVED_STATUSES))
+
+        def write(conn):
+            actions = conn.execute(
+                "DELETE FROM call_actions WHERE status IN ('sent', 'dead') AND created_at < ?",
+                (cutoff,),
+            ).rowcount
+            approvals = conn.execute(
+                f"DELETE FROM pending_transactions WHERE status IN ({placeholders}) "
+                "AND updated_at < ?",
+                (*RESOLVED_STATUSES, cutoff),
+            ).rowcount
+            return actions, approvals
+
+        return self._submit(write)
+
+
+# ---------------------------------------------------------------------
+#  REPLAY WORKER
+# ---------------------------------------------------------------------
+
+
+def start_replay_worker(outbox: Outbox, deliver, interval: float = 2.0):
+    """
+    Background loop that (re)delivers queued call actions via
+    deliver(entry_id, path, body) and periodically purges old rows. Returns an
+    Event; set it to sweep now instead of waiting for the next interval.
+    """
+    wakeup = threading.Event()
+
+    def loop():
+        last_purge = 0.0
+        while True:
+            if time.time() - last_purge >= PURGE_INTERVAL_SECONDS:
+                last_purge = time.time()
+                try:
+                    actions, approvals = outbox.purge()
+                    if actions or approvals:
+                        print(
+                            f"🧹 [OUTBOX] Purged {actions} finished call actions and "
+                            f"{approvals} resolved approvals"
+                        )
+                except Exception as e:
+                    print(f"❌ [OUTBOX] Purge failed: {e}")
+
+            delivered = False
+            try:
+                for entry in outbox.due_actions():
+                    if outbox.claim(entry["id"]):
+                        deliver(entry["id"], entry["path"], entry["body"])
+                        delivered = True
+            except Exception as e:
+                print(f"❌ [OUTBOX] Replay sweep failed: {e}")
+
+            if not delivered:
+                wakeup.wait(interval)
+                wakeup.clear()
+
+    thread = threading.Thread(target=loop, name="sentinel-outbox-replay", daemon=True)
+    thread.start()
+    return wakeup
@@ -0,0 +1,362 @@
+"""
+payloads.py - Typed Action Payloads
+Per-action payload schemas plus the size guards that run before scoring.
+Bulky fields (record lists, long strings) are reduced to compact summaries so
+the LLM prompt, Sentry spans and stored state stay small whatever the agent sends.
+"""
+
+import json
+import os
+import re
+from typing import Annotated, List, Optional, Union
+
+from pydantic import BaseModel, BeforeValidator, ConfigDict, model_validator
+
+from pii import PiiReport, scan_records
+
+# Hard cap on the raw request body; larger requests are rejected with 413.
+MAX_REQUEST_BYTES = int(os.getenv("SENTINEL_MAX_REQUEST_BYTES", str(10 * 1024 * 1024)))
+
+# Lists longer than this (or any list under a record key) are summarized.
+MAX_INLINE_ITEMS = int(os.getenv("SENTINEL_MAX_INLINE_ITEMS", "20"))
+
+# Strings longer than this are truncated before they reach the prompt.
+MAX_STRING_CHARS = int(os.getenv("SENTINEL_MAX_STRING_CHARS", "2000"))
+
+# At most this many distinct field names are reported per record list.
+MAX_FIELD_NAMES = 50
+
+# Nested dicts deeper than this are replaced by a placeholder.
+MAX_DEPTH = 3
+
+# Payload keys that always carry record lists for PrivacyShield actions.
+RECORD_KEYS = ("records", "rows", "data")
+
+# Column names that usually hold personal data, matched against the whole
+# name (last dotted segment), so account_id or discount_card_tier don't count.
+# Informational only: contains_pii comes from the values (pii.py), not names.
+PII_FIELD_PATTERN = re.compile(
+    r"ssn|social_?security(_?number)?|tax_?id|passport(_?(number|no))?|dob|"
+    r"date_?of_?birth|birth_?date|e_?mail(_?address)?|phone(_?number)?|mobile|"
+    r"(street_?|home_?|mailing_?)?address|zip(_?code)?|postal_?code|"
+    r"(first|last|full)_?name|(credit_?)?card_?(number|no)|credit_?card|iban|"
+    r"(bank_?)?account_?(number|no)|salary",
+    re.IGNORECASE,
+)
+
+
+# ---------------------------------------------------------------------
+#  SCHEMAS
+# ---------------------------------------------------------------------
+
+
+class RecordSummary(BaseModel):
+    """
+    What scoring sees instead of a full record list.
+    """
+
+    record_count: int = 0
+    field_names: List[str] = []
+    # Names that look personal; a hint for the prompt, not a detection
+    pii_columns: List[str] = []
+
+
+def _as_text(value):
+    # Agents send ids and names as numbers too ("user_id": 42)
+    if isinstance(value, (int, float)):
+        return str(value)
+    return value
+
+
+# str field that also accepts numbers, like the old str(payload.get(...)) reads
+Text = Annotated[str, BeforeValidator(_as_text)]
+
+
+class BasePayload(BaseModel):
+    # Unknown keys are kept (already size-capped) so the LLM still sees them
+    model_config = ConfigDict(extra="allow")
+
+    environment: Text = ""
+
+    @model_validator(mode="before")
+    @classmethod
+    def _null_means_default(cls, data):
+        # `"amount": null` falls back to the default, as `payload.get(...) or 0` did
+        if isinstance(data, dict):
+            return {
+                k: v for k, v in data.items() if v is not None or k not in cls.model_fields
+            }
+        return data
+
+
+class PayInvoicePayload(BasePayload):
+    # int stays int, so the call says "10000 dollars", not "10000.0"
+    amount: Union[int, float] = 0
+    vendor: Text = ""
+
+
+class DataAccessPayload(BasePayload):
+    record_count: int = 0
+    contains_pii: bool = False
+    records: Optional[RecordSummary] = None
+    # Filled by the detection stage in pii.py, never by the agent
+    pii: Optional[PiiReport] = None
+
+
+class InfraPayload(BasePayload):
+    table: Text = ""
+    user_id: Text = ""
+
+
+PAYLOAD_SCHEMAS = {
+    # Module A: VaultKeeper
+    "PAY_INVOICE": PayInvoicePayload,
+    # Module B: PrivacyShield
+    "EXPORT_CSV": DataAccessPayload,
+    "SHARE_RECORD": DataAccessPayload,
+    "QUERY_SSN": DataAccessPayload,
+    # Module C: OpsGuard
+    "DELETE_USER": InfraPayload,
+    "DROP_TABLE": InfraPayload,
+    "RESTART_SERVER": InfraPayload,
+    "WIPE_DATABASE": InfraPayload,
+}
+
+
+# ---------------------------------------------------------------------
+#  COMPACTION
+# ---------------------------------------------------------------------
+
+
+def summarize_records(items: list, columns: Optional[list] = None) -> RecordSummary:
+    """
+    Single pass over a record list: count rows and collect field names without
+    copying the records. Rows may be dicts, or lists paired with `columns`.
+    """
+    field_names = {}
+    if columns:
+        for name in columns[:MAX_FIELD_NAMES]:
+            field_names[str(name)] = None
+
+    count = 0
+    for item in items:
+        count += 1
+        if isinstance(item, dict) and len(field_names) < MAX_FIELD_NAMES:
+            for key in item:
+                key = str(key)
+                if key not in field_names:
+                    field_names[key] = None
+                    if len(field_names) >= MAX_FIELD_NAMES:
+                        break
+
+    names = list(field_names)
+    return RecordSummary(
+        record_count=count,
+        field_names=names,
+        pii_columns=[n for n in names if PII_FIELD_PATTERN.fullmatch(n.rsplit(".", 1)[-1])],
+    )
+
+
+def _clip_string(value: str) -> str:
+    if len(value) <= MAX_STRING_CHARS:
+        return value
+    return value[:MAX_STRING_CHARS] + f"... [truncated {len(value) - MAX_STRING_CHARS} chars]"
+
+
+def _compact_value(value, depth: int):
+    """
+    Compact one value sitting `depth` levels below the payload root: strings
+    are clipped, long lists summarized, and containers past MAX_DEPTH replaced
+    by a placeholder. Lists count as a level, like dicts.
+    """
+    if isinstance(value, str):
+        return _clip_string(value)
+    if isinstance(value, dict):
+        if depth >= MAX_DEPTH:
+            return f"<object with {len(value)} keys>"
+        return compact_payload(value, depth)
+    if isinstance(value, list):
+        if len(value) > MAX_INLINE_ITEMS:
+            return summarize_records(value).model_dump()
+        if depth >= MAX_DEPTH:
+            return f"<list with {len(value)} items>"
+        return [_compact_value(v, depth + 1) for v in value]
+    return value
+
+
+def compact_payload(payload: dict, depth: int = 0) -> dict:
+    """
+    Returns a copy of `payload` where record lists become RecordSummary dicts,
+    long strings are truncated and deep nesting is cut off, inside lists too.
+    """
+    columns = payload.get("columns") or payload.get("fields")
+    if not isinstance(columns, list):
+        columns = None
+
+    compact = {}
+    for key, value in payload.items():
+        if isinstance(value, list) and (key in RECORD_KEYS or len(value) > MAX_INLINE_ITEMS):
+            compact[key] = summarize_records(value, columns).model_dump()
+        else:
+            compact[key] = _compact_value(value, depth + 1)
+    return compact
+
+
+def find_record_lists(payload: dict) -> list:
+    """
+    Every record list in the raw payload, at any depth, as (key, rows, columns):
+    lists under a RECORD_KEYS key, plus single `record` objects as one-row
+    lists. `columns` comes from the object holding the list. Record lists
+    themselves are not searched further; their rows are what gets scanned.
+    """
+    found = []
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(v for v in node if isinstance(v, (dict, list)))
+            continue
+
+        columns = node.get("columns") or node.get("fields")
+        if not isinstance(columns, list):
+            columns = None
+        for key, value in node.items():
+            if key in RECORD_KEYS and isinstance(value, list):
+                found.append((key, value, columns))
+            elif key == "record" and isinstance(value, dict):
+                found.append((key, [value], columns))
+            elif isinstance(value, (dict, list)):
+                stack.append(value)
+    return found
+
+
+def detect_pii(payload: dict) -> Optional[PiiReport]:
+    """
+    Run the PII detection stage over the raw record lists (and single
+    `record` objects), wherever they are nested, before they are compacted away.
+    """
+    report = None
+    for _, rows, columns in find_record_lists(payload):
+        if not rows:
+            continue
+        found = scan_records(rows, columns)
+        if report is None:
+            report = found
+        else:
+            report.merge(found)
+    return report
+
+
+def normalize_payload(action: str, payload: dict) -> BasePayload:
+    """
+    Compact the raw payload and validate it against the action's schema.
+    For PrivacyShield actions, record summaries and detected PII values override
+    the agent's self-reported record_count / contains_pii when they show more.
+    Raises pydantic.ValidationError on malformed fields.
+    """
+    payload = payload or {}
+    schema = PAYLOAD_SCHEMAS.get(action, BasePayload)
+
+    compact = compact_payload(payload)
+    compact.pop("pii", None)
+    typed = schema.model_validate(compact)
+
+    if isinstance(typed, DataAccessPayload):
+        # Count every record list, wherever the agent nested it
+        summaries = [
+            summarize_records(rows, columns)
+            for key, rows, columns in find_record_lists(payload)
+            if key in RECORD_KEYS
+        ]
+        if typed.records is not None and not isinstance(payload.get("records"), list):
+            # Agent sent its own summary object; self-reported, like record_count
+            summaries.append(typed.records)
+        if summaries:
+            detected = sum(s.record_count for s in summaries)
+            typed.record_count = max(typed.record_count, detected)
+
+        typed.pii = detect_pii(payload)
+        if typed.pii is not None and typed.pii.total > 0:
+            typed.contains_pii = True
+
+    return typed
+
+
+# ---------------------------------------------------------------------
+#  REQUEST SIZE LIMIT (ASGI middleware)
+# ---------------------------------------------------------------------
+
+
+class PayloadSizeLimitMiddleware:
+    """
+    Rejects request bodies over `max_bytes` with 413 before they are parsed.
+    Uses Content-Length when present; chunked bodies are counted as they stream.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_REQUEST_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None:
+            try:
+                too_large = int(content_length) > self.max_bytes
+            except ValueError:
+                too_large = False
+            if too_large:
+                await self._reject(send)
+                return
+            await self.app(scope, receive, send)
+            return
+
+        # No Content-Length: read up to the cap, then replay to the app
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                return
+            body = message.get("body", b"")
+            size += len(body)
+            if size > self.max_bytes:
+                await self._reject(send)
+                return
+            chunks.append(body)
+            if not message.get("more_body", False):
+                break
+
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": b"".join(chunks), "more_body": False}
+            return await receive()
+
+        await self.app(scope, replay, send)
+
+    async def _reject(self, send):
+        body = json.dumps(
+            {
+                "status": "PAYLOAD_TOO_LARGE",
+                "analysis": f"Request body exceeds {self.max_bytes} bytes.",
+            }
+        ).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 413,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("ascii")),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
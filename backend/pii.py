@@ -0,0 +1,311 @@
+"""
+pii.py - PrivacyShield Detection Stage
+Scans records attached to EXPORT_CSV / SHARE_RECORD / QUERY_SSN payloads for
+SSNs, credit cards (Luhn), emails and IBANs (mod-97), instead of trusting the
+agent's own contains_pii / record_count flags.
+
+Records are scanned column by column: each column is joined into one string
+and every precompiled pattern makes a single pass over it, so the per-row work
+stays in C. Nested objects and lists inside a cell become their own dotted
+columns (customer.ssn, note[]). Rows are read in order up to a character
+budget; anything past it is reported as unscanned, never as clean.
+"""
+
+import json
+import math
+import os
+import random
+import re
+import time
+from itertools import chain, repeat, zip_longest
+from typing import Dict, Iterable, List, Optional
+
+from pydantic import BaseModel
+
+# Scan budget in characters per record list. The default is above the request
+# size cap, so every accepted payload is scanned in full.
+MAX_SCAN_CHARS = int(os.getenv("SENTINEL_PII_MAX_SCAN_CHARS", str(16 * 1024 * 1024)))
+
+# Rows handled per scan pass; the budget is checked between passes.
+SCAN_CHUNK_ROWS = 5000
+
+# Cells nested deeper than this are scanned as their JSON text.
+MAX_NESTING = 8
+
+# Checksums run on at most this many regex matches per column and type;
+# beyond that the valid ratio of an even sample is extrapolated.
+MAX_VALIDATIONS = 2000
+
+# Precompiled per-type patterns. Separate passes (each behind a cheap gate)
+# beat one big alternation on long column strings.
+EMAIL_PATTERN = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+IBAN_PATTERN = re.compile(r"\b[A-Z]{2}\d{2}(?: ?[A-Z0-9]){11,30}\b")
+SSN_PATTERN = re.compile(r"\b(?!000|666|9\d\d)\d{3}[- ](?!00)\d{2}[- ](?!0000)\d{4}\b")
+CARD_PATTERN = re.compile(r"(?<![\w.])\d(?:[ -]?\d){12,18}(?!\w|\.\d)")
+
+_NON_ALNUM = re.compile(r"[^A-Za-z0-9]")
+
+PII_TYPES = ("ssn", "credit_card", "email", "iban")
+
+PII_LABELS = {
+    "ssn": "SSNs",
+    "credit_card": "card numbers",
+    "email": "email addresses",
+    "iban": "IBANs",
+}
+
+# Base risk when a type is present at all; volume adds up to +30 on top.
+PII_BASE_RISK = {
+    "ssn": 70,
+    "credit_card": 70,
+    "iban": 65,
+    "email": 40,
+}
+
+
+class PiiReport(BaseModel):
+    """
+    Detected PII for one payload. `truncated` means the scan budget ran out
+    and rows_total - rows_scanned rows were never read.
+    """
+
+    counts: Dict[str, int] = {}
+    columns: Dict[str, List[str]] = {}
+    rows_total: int = 0
+    rows_scanned: int = 0
+    truncated: bool = False
+    scan_ms: float = 0.0
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def rows_unscanned(self) -> int:
+        return self.rows_total - self.rows_scanned
+
+    def merge(self, other: "PiiReport"):
+        for pii_type, count in other.counts.items():
+            self.counts[pii_type] = self.counts.get(pii_type, 0) + count
+        for column, types in other.columns.items():
+            merged = self.columns.setdefault(column, [])
+            merged.extend(t for t in types if t not in merged)
+        self.rows_total += other.rows_total
+        self.rows_scanned += other.rows_scanned
+        self.truncated = self.truncated or other.truncated
+        self.scan_ms += other.scan_ms
+
+
+# ---------------------------------------------------------------------
+#  CHECKSUM VALIDATORS
+# ---------------------------------------------------------------------
+
+# Luhn doubling of a digit, indexed by the digit itself
+_LUHN_DOUBLED = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+
+# IBAN mod-97: letters become 10..35 before the numeric check
+_IBAN_DIGITS = str.maketrans({chr(c): str(c - 55) for c in range(65, 91)})
+
+
+def luhn_valid(digits: str) -> bool:
+    if not 13 <= len(digits) <= 19:
+        return False
+    values = [ord(ch) - 48 for ch in digits]
+    total = sum(values[-1::-2]) + sum(_LUHN_DOUBLED[d] for d in values[-2::-2])
+    return total % 10 == 0
+
+
+def iban_valid(iban: str) -> bool:
+    if not 15 <= len(iban) <= 34:
+        return False
+    rearranged = iban[4:] + iban[:4]
+    return int(rearranged.translate(_IBAN_DIGITS)) % 97 == 1
+
+
+# ---------------------------------------------------------------------
+#  COLUMN SCAN
+# ---------------------------------------------------------------------
+
+
+def _count_valid(matches: list, validator) -> int:
+    """
+    Checksum at most MAX_VALIDATIONS matches and scale the valid fraction of
+    that sample back up to the full match count. The sample is seeded so the
+    same payload always gets the same score.
+    """
+    if len(matches) <= MAX_VALIDATIONS:
+        return sum(1 for m in matches if validator(_NON_ALNUM.sub("", m)))
+    checked = random.Random(len(matches)).sample(matches, MAX_VALIDATIONS)
+    valid = sum(1 for m in checked if validator(_NON_ALNUM.sub("", m)))
+    return int(round(valid * len(matches) / MAX_VALIDATIONS))
+
+
+def _count_pii(strings: list, long_ints: list) -> Dict[str, int]:
+    """
+    Count validated PII matches in one column's cells. String cells are joined
+    into a single newline-separated blob and each pattern makes one findall()
+    pass over it; integer cells are only checked as card numbers.
+    """
+    counts = {}
+    blob = "\n".join(strings)
+
+    if "@" in blob:
+        counts["email"] = len(EMAIL_PATTERN.findall(blob))
+
+    counts["ssn"] = len(SSN_PATTERN.findall(blob))
+
+    if blob != blob.lower():  # IBANs need uppercase letters
+        counts["iban"] = _count_valid(IBAN_PATTERN.findall(blob), iban_valid)
+        # The digit tail of an IBAN can look like a card number
+        blob = IBAN_PATTERN.sub("\n", blob)
+
+    counts["credit_card"] = _count_valid(
+        CARD_PATTERN.findall(blob) + long_ints, luhn_valid
+    )
+
+    return {t: c for t, c in counts.items() if c}
+
+
+def _scan_column_tree(name: str, values, found: dict, depth: int = 0) -> int:
+    """
+    Scan one column into found[name], then its nested cells as sub-columns:
+    dict cells as name.key, list cells as name[]. Floats, bools and None can't
+    hold these identifiers and are skipped. Returns characters scanned.
+    """
+    strings = []
+    long_ints = []
+    nested = {}
+    for value in values:
+        kind = value.__class__
+        if kind is str:
+            strings.append(value)
+        elif kind is int:
+            if value >= 10**12:
+                long_ints.append(str(value))
+        elif kind is dict or kind is list or kind is tuple:
+            if depth >= MAX_NESTING:
+                strings.append(json.dumps(value, default=str))
+            elif kind is dict:
+                for key, cell in value.items():
+                    nested.setdefault(f"{name}.{key}", []).append(cell)
+            else:
+                nested.setdefault(f"{name}[]", []).extend(value)
+
+    chars = sum(map(len, strings))
+    counts = _count_pii(strings, long_ints)
+    if counts:
+        merged = found.setdefault(name, {})
+        for pii_type, count in counts.items():
+            merged[pii_type] = merged.get(pii_type, 0) + count
+
+    for sub_name, cells in nested.items():
+        chars += _scan_column_tree(sub_name, cells, found, depth + 1)
+    return chars
+
+
+def scan_column(values) -> Dict[str, int]:
+    """
+    Count validated PII matches in one column, nested cells included.
+    """
+    found = {}
+    _scan_column_tree("value", values, found)
+    totals = {}
+    for counts in found.values():
+        for pii_type, count in counts.items():
+            totals[pii_type] = totals.get(pii_type, 0) + count
+    return totals
+
+
+def _columns_of(rows: list, columns: Optional[list]) -> Dict[str, Iterable]:
+    """
+    Transpose rows into {column_name: cells}. Rows may be dicts, lists (named
+    by `columns`, else by index) or scalars (a single "value" column), mixed
+    freely. The transpose itself runs in C via map()/zip().
+    """
+    dict_rows = [row for row in rows if isinstance(row, dict)]
+    list_rows = [row for row in rows if isinstance(row, (list, tuple))]
+    other = [row for row in rows if not isinstance(row, (dict, list, tuple))]
+
+    table = {}
+    if dict_rows:
+        names = dict.fromkeys(chain.from_iterable(dict_rows))
+        for name in names:
+            table[str(name)] = map(dict.get, dict_rows, repeat(name))
+    if list_rows:
+        for i, cells in enumerate(zip_longest(*list_rows)):
+            name = str(columns[i]) if columns and i < len(columns) else f"col_{i}"
+            table[name] = chain(table[name], cells) if name in table else cells
+    if other:
+        table["value"] = chain(table["value"], other) if "value" in table else other
+    return table
+
+
+def scan_records(rows: list, columns: Optional[list] = None) -> PiiReport:
+    """
+    Scan rows in order, SCAN_CHUNK_ROWS at a time, until MAX_SCAN_CHARS have
+    been read. Rows past the budget are left out of the counts and flagged
+    via `truncated` so the policy can treat them as unknown.
+    """
+    start = time.perf_counter()
+    found = {}
+    chars = 0
+    rows_scanned = 0
+
+    for offset in range(0, len(rows), SCAN_CHUNK_ROWS):
+        if MAX_SCAN_CHARS > 0 and chars >= MAX_SCAN_CHARS:
+            break
+        chunk = rows[offset:offset + SCAN_CHUNK_ROWS]
+        for name, values in _columns_of(chunk, columns).items():
+            chars += _scan_column_tree(name, values, found)
+        rows_scanned += len(chunk)
+
+    counts = {}
+    column_types = {}
+    for name, column_counts in found.items():
+        column_types[name] = sorted(column_counts)
+        for pii_type, count in column_counts.items():
+            counts[pii_type] = counts.get(pii_type, 0) + count
+
+    return PiiReport(
+        counts=counts,
+        columns=column_types,
+        rows_total=len(rows),
+        rows_scanned=rows_scanned,
+        truncated=rows_scanned < len(rows),
+        scan_ms=(time.perf_counter() - start) * 1000,
+    )
+
+
+# ---------------------------------------------------------------------
+#  SCORING
+# ---------------------------------------------------------------------
+
+
+def pii_risk_score(report: PiiReport) -> int:
+    """
+    0 when nothing was found; otherwise the worst type's base risk plus up to
+    +30 for volume (+10 per order of magnitude).
+    """
+    score = 0
+    for pii_type, count in report.counts.items():
+        if count <= 0:
+            continue
+        volume = min(30, int(10 * math.log10(count)))
+        score = max(score, PII_BASE_RISK.get(pii_type, 40) + volume)
+    return min(100, score)
+
+
+def describe(report: PiiReport) -> str:
+    found = ", ".join(
+        f"{report.counts[t]} {PII_LABELS[t]}"
+        for t in PII_TYPES
+        if report.counts.get(t)
+    )
+    if report.truncated:
+        scope = (
+            f"the first {report.rows_scanned} of {report.rows_total} rows "
+            f"({report.rows_unscanned} not scanned)"
+        )
+    else:
+        scope = f"{report.rows_total} rows"
+    return f"{found or 'no PII'} detected across {scope}"
@@ -3,6 +3,35 @@ policy.py - The Vertical Logic
 Defines what constitutes "Safe" vs "Risky" behavior for a FinOps Agent.
 """
 
+from pii import describe as describe_pii, pii_risk_score
+
+# Knobs for apply_sentinel_policy(). simulate.py replays history against
+# modified copies of this dict to preview the effect of a change.
+DEFAULT_THRESHOLDS = {
+    # Anything scoring above this (and not hard-blocked) goes to voice auth
+    "voice_auth_threshold": 50,
+    # PrivacyShield
+    "export_record_limit": 10,
+    "export_risk": 95,
+    "share_pii_risk": 90,
+    # Floor when the PII scan ran out of budget: unread rows are unknown, not clean
+    "unscanned_pii_risk": 75,
+    # OpsGuard
+    "delete_user_min_risk": 70,
+    # Demo bucketing
+    "unknown_vendor_min_amount": 5000,
+    "medium_export_min_records": 50,
+    "medium_export_max_records": 500,
+    "trusted_payment_max_amount": 1000,
+}
+
+TRUSTED_VENDORS = ["Trusted SaaS Inc", "AWS", "Stripe"]
+
+# Decisions returned by apply_sentinel_policy()
+AUTO_APPROVE = "AUTO_APPROVE"
+VOICE_AUTH = "VOICE_AUTH"
+HARD_BLOCK = "HARD_BLOCK"
+
 def evaluate_risk(action: str, payload: dict) -> dict:
     """
     Returns a dict with:
@@ -42,4 +71,132 @@ def evaluate_risk(action: str, payload: dict) -> dict:
         "risk_score": 0.0,
         "status": "ALLOWED",
         "reason": "Routine operation."
-    }
\ No newline at end of file
+    }
+
+
+def apply_sentinel_policy(
+    action: str,
+    payload: dict,
+    agent_id: str,
+    risk_score,
+    analysis: str,
+    pii_report=None,
+    thresholds: dict = None,
+) -> dict:
+    """
+    The deterministic half of /execute: takes the LLM's baseline score and
+    applies module rules, detected PII and demo bucketing. Pure function, so
+    the live endpoint and offline replay share it.
+
+    Returns a dict with:
+    - risk_score: int/float (0 to 100)
+    - analysis: str
+    - decision: AUTO_APPROVE | VOICE_AUTH | HARD_BLOCK
+    """
+    t = DEFAULT_THRESHOLDS if thresholds is None else {**DEFAULT_THRESHOLDS, **thresholds}
+
+    # Extract common fields for bucketing
+    amount = float(payload.get("amount", 0) or 0)
+    vendor = str(payload.get("vendor", "") or "")
+    record_count = int(payload.get("record_count", 0) or 0)
+    contains_pii = bool(payload.get("contains_pii", False))
+    environment = str(payload.get("environment", "") or "").lower()
+
+    # ------------------------------------------------------------------
+    # Module-specific policies (B & C)
+    # ------------------------------------------------------------------
+
+    # --- Module B: PrivacyShield (Data) ---
+    # EXPORT_CSV / SHARE_RECORD / QUERY_SSN
+    if action == "EXPORT_CSV":
+        if record_count > t["export_record_limit"] or contains_pii:
+            risk_score = max(risk_score, t["export_risk"])
+            analysis = (
+                f"PrivacyShield: bulk export of {record_count} records "
+                "with personal data creates a high risk of data exfiltration."
+            )
+    elif action in ("SHARE_RECORD", "QUERY_SSN"):
+        if contains_pii:
+            risk_score = max(risk_score, t["share_pii_risk"])
+            analysis = (
+                "PrivacyShield: accessing or sharing SSN/PII is restricted and should "
+                "only be done with strong justification and approval."
+            )
+
+    # Detected PII drives the score directly, whatever the agent self-reported
+    if pii_report is not None:
+        pii_score = pii_risk_score(pii_report)
+        if pii_report.truncated:
+            pii_score = max(pii_score, t["unscanned_pii_risk"])
+        if pii_score > 0:
+            risk_score = max(risk_score, pii_score)
+            analysis = f"PrivacyShield: {describe_pii(pii_report)}. {analysis}"
+
+    # --- Module C: OpsGuard (Infrastructure) ---
+    if action == "DROP_TABLE":
+        # Hard block
+        return {
+            "risk_score": 100,
+            "analysis": (
+                "OpsGuard: DROP_TABLE is hard blocked to prevent destructive schema changes "
+                "in critical environments."
+            ),
+            "decision": HARD_BLOCK,
+        }
+
+    if action == "DELETE_USER":
+        # Default: high risk & voice auth, demo bucketing may adjust score
+        risk_score = max(risk_score, t["delete_user_min_risk"])
+        analysis = (
+            "OpsGuard: deleting user accounts, especially privileged ones, should not be "
+            "performed autonomously by agents."
+        )
+
+    # ------------------------------------------------------------------
+    # DEMO BUCKETING: 1 very high, 2 medium, 3 low
+    # ------------------------------------------------------------------
+
+    # 1) Very high risk – AGI big unknown payment
+    if (
+        action == "PAY_INVOICE"
+        and agent_id.startswith("session_")
+        and amount >= t["unknown_vendor_min_amount"]
+        and vendor == "Unknown Corp"
+    ):
+        risk_score = 95
+
+    # 2) Medium risk – PrivacyShield export
+    elif (
+        action == "EXPORT_CSV"
+        and t["medium_export_min_records"] <= record_count <= t["medium_export_max_records"]
+        and not contains_pii
+    ):
+        risk_score = 65
+
+    # 3) Medium risk – OpsGuard delete in prod
+    elif action == "DELETE_USER" and environment == "production":
+        risk_score = 70
+
+    # 4) Low risk – small trusted payment
+    elif (
+        action == "PAY_INVOICE"
+        and amount <= t["trusted_payment_max_amount"]
+        and vendor in TRUSTED_VENDORS
+    ):
+        risk_score = 10
+
+    # 5) Low risk – tiny CSV, no PII
+    elif (
+        action == "EXPORT_CSV"
+        and record_count <= t["export_record_limit"]
+        and not contains_pii
+    ):
+        risk_score = 15
+
+    # 6) Low risk – restart in staging/dev
+    elif action == "RESTART_SERVER" and environment in ["staging", "dev"]:
+        risk_score = 20
+
+    # Voice auth for anything above the threshold that wasn't hard-blocked
+    decision = VOICE_AUTH if risk_score > t["voice_auth_threshold"] else AUTO_APPROVE
+    return {"risk_score": risk_score, "analysis": analysis, "decision": decision}
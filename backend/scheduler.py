@@ -0,0 +1,237 @@
+"""
+scheduler.py - Per-Module Executors
+VaultKeeper, PrivacyShield and OpsGuard each get their own worker pool and
+bounded priority queue, so a flood of EXPORT_CSV checks can't delay a
+production DELETE_USER. Each executor tracks queue depth and wait time.
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+MODULE_OF_ACTION = {
+    # Module A: VaultKeeper
+    "PAY_INVOICE": "VaultKeeper",
+    # Module B: PrivacyShield
+    "EXPORT_CSV": "PrivacyShield",
+    "SHARE_RECORD": "PrivacyShield",
+    "QUERY_SSN": "PrivacyShield",
+    # Module C: OpsGuard
+    "DELETE_USER": "OpsGuard",
+    "DROP_TABLE": "OpsGuard",
+    "RESTART_SERVER": "OpsGuard",
+    "WIPE_DATABASE": "OpsGuard",
+}
+
+# Actions outside the three modules
+DEFAULT_MODULE = "General"
+
+
+def _module_limit(module: str, name: str, default: int) -> int:
+    # e.g. SENTINEL_PRIVACYSHIELD_WORKERS=8
+    return int(os.getenv(f"SENTINEL_{module.upper()}_{name}", str(default)))
+
+
+# workers = concurrency limit, max_queue = waiting requests before 503.
+# A full queue still takes higher-priority work by evicting the newest lower one.
+MODULE_LIMITS = {
+    module: {
+        "workers": _module_limit(module, "WORKERS", workers),
+        "max_queue": _module_limit(module, "MAX_QUEUE", max_queue),
+    }
+    for module, workers, max_queue in (
+        ("VaultKeeper", 4, 100),
+        ("PrivacyShield", 4, 200),
+        ("OpsGuard", 4, 100),
+        (DEFAULT_MODULE, 2, 50),
+    )
+}
+
+# Priorities are a head start on the queue: an item sorts as if it had been
+# enqueued this many seconds earlier. Higher priorities go first, but a
+# normal item that has waited longer than the head start still gets its turn.
+PRIORITY_HEADSTART_SECONDS = {
+    "critical": 60.0,
+    "high": 20.0,
+    "normal": 0.0,
+}
+
+# Wait-time samples kept per module for percentiles.
+WAIT_SAMPLES = 1024
+
+
+class ModuleBusy(Exception):
+    """
+    The module's queue is full.
+    """
+
+
+def classify_priority(action: str, payload: dict) -> str:
+    """
+    Cheap pre-analysis priority from the action type and raw payload.
+    Production environments move up one level.
+    """
+    payload = payload if isinstance(payload, dict) else {}
+
+    if action in ("DROP_TABLE", "WIPE_DATABASE", "DELETE_USER"):
+        return "critical"
+
+    try:
+        amount = float(payload.get("amount", 0) or 0)
+    except (TypeError, ValueError):
+        amount = 0.0
+
+    if action in ("QUERY_SSN", "SHARE_RECORD") or (action == "PAY_INVOICE" and amount > 5000):
+        level = "high"
+    else:
+        level = "normal"
+
+    if str(payload.get("environment", "") or "").lower() == "production":
+        level = "critical" if level == "high" else "high"
+    return level
+
+
+def _percentile(samples: list, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class ModuleExecutor:
+    def __init__(self, name: str, workers: int, max_queue: int):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self._heap = []
+        self._seq = itertools.count()
+        self._cv = threading.Condition()
+
+        self._active = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._evicted = 0
+        self._waits_ms = deque(maxlen=WAIT_SAMPLES)
+        self._max_wait_ms = 0.0
+
+        for i in range(workers):
+            threading.Thread(
+                target=self._work, name=f"sentinel-{name.lower()}-{i}", daemon=True
+            ).start()
+
+    def submit(self, fn, priority: str = "normal") -> Future:
+        """
+        Queue fn(). When the queue is full, a higher-priority item evicts the
+        newest queued item of a lower priority (whose future fails with
+        ModuleBusy); otherwise the new item is rejected with ModuleBusy.
+        """
+        future = Future()
+        now = time.monotonic()
+        headstart = PRIORITY_HEADSTART_SECONDS.get(priority, 0.0)
+        evicted = None
+
+        with self._cv:
+            if len(self._heap) >= self.max_queue:
+                evicted = self._evict_below(headstart)
+                if evicted is None:
+                    self._rejected += 1
+                    raise ModuleBusy(self.name)
+            heapq.heappush(
+                self._heap, (now - headstart, next(self._seq), now, priority, fn, future)
+            )
+            self._submitted += 1
+            self._cv.notify()
+
+        # Failed outside the lock: the future's callbacks may take other locks
+        if evicted is not None and evicted.set_running_or_notify_cancel():
+            evicted.set_exception(ModuleBusy(self.name))
+        return future
+
+    def _evict_below(self, headstart: float):
+        """
+        Remove the most recently queued item with a smaller head start than
+        `headstart` and return its future, or None. Caller holds self._cv.
+        """
+        victim = None
+        for i, item in enumerate(self._heap):
+            if PRIORITY_HEADSTART_SECONDS.get(item[3], 0.0) >= headstart:
+                continue
+            if victim is None or item[2] > self._heap[victim][2]:
+                victim = i
+        if victim is None:
+            return None
+
+        future = self._heap[victim][5]
+        self._heap[victim] = self._heap[-1]
+        self._heap.pop()
+        heapq.heapify(self._heap)
+        self._evicted += 1
+        return future
+
+    def _work(self):
+        while True:
+            with self._cv:
+                while not self._heap:
+                    self._cv.wait()
+                _, _, enqueued, _, fn, future = heapq.heappop(self._heap)
+                wait_ms = (time.monotonic() - enqueued) * 1000
+                self._waits_ms.append(wait_ms)
+                self._max_wait_ms = max(self._max_wait_ms, wait_ms)
+                self._active += 1
+
+            # Skipped if the caller gave up while it was queued
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn())
+                except BaseException as e:
+                    future.set_exception(e)
+
+            with self._cv:
+                self._active -= 1
+                self._completed += 1
+
+    def metrics(self) -> dict:
+        with self._cv:
+            depth_by_priority = {p: 0 for p in PRIORITY_HEADSTART_SECONDS}
+            for item in self._heap:
+                depth_by_priority[item[3]] = depth_by_priority.get(item[3], 0) + 1
+            waits = list(self._waits_ms)
+            return {
+                "workers": self.workers,
+                "active": self._active,
+                "max_queue": self.max_queue,
+                "queue_depth": len(self._heap),
+                "queue_depth_by_priority": depth_by_priority,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "evicted": self._evicted,
+                "wait_ms_p50": round(_percentile(waits, 0.50), 1),
+                "wait_ms_p95": round(_percentile(waits, 0.95), 1),
+                "wait_ms_max": round(self._max_wait_ms, 1),
+            }
+
+
+class ModuleScheduler:
+    def __init__(self, limits: dict = MODULE_LIMITS):
+        self.executors = {
+            module: ModuleExecutor(module, cfg["workers"], cfg["max_queue"])
+            for module, cfg in limits.items()
+        }
+
+    def submit(self, action: str, payload: dict, fn):
+        """
+        Queue fn() on the action's module executor. Returns (future, module,
+        priority); raises ModuleBusy when that module's queue is full.
+        """
+        module = MODULE_OF_ACTION.get(action, DEFAULT_MODULE)
+        priority = classify_priority(action, payload)
+        return self.executors[module].submit(fn, priority), module, priority
+
+    def metrics(self) -> dict:
+        return {module: ex.metrics() for module, ex in self.executors.items()}
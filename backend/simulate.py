@@ -0,0 +1,350 @@
+"""
+simulate.py - Offline Policy Replay
+Replays a historical action log through the Sentinel policy pipeline (payload
+normalization, PII detection, apply_sentinel_policy) with a baseline and a
+candidate set of thresholds, and reports how decisions and voice-call volume
+would change. No Groq or Telnyx calls are made: the LLM score comes from the
+log, a cache file, or the static rules in evaluate_risk().
+
+Log format: JSON Lines, one action per line, with the /execute body fields
+(agent_id, action, payload, reasoning) and optionally:
+  - llm_score / llm_analysis: the Groq result recorded at the time
+  - timestamp: epoch seconds or ISO-8601, used to report calls per day
+
+Usage (from backend/):
+    python simulate.py actions.jsonl --set voice_auth_threshold=60 --workers 8
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from functools import partial
+from multiprocessing import Pool
+
+from pydantic import ValidationError
+
+from payloads import normalize_payload
+from pii import PiiReport
+from policy import (
+    AUTO_APPROVE,
+    DEFAULT_THRESHOLDS,
+    HARD_BLOCK,
+    VOICE_AUTH,
+    apply_sentinel_policy,
+    evaluate_risk,
+)
+
+DECISIONS = (AUTO_APPROVE, VOICE_AUTH, HARD_BLOCK)
+
+# Lines shipped to a worker per task.
+DEFAULT_CHUNK_SIZE = 5000
+
+# Set per worker process by _init_worker()
+_LLM_CACHE = {}
+
+
+def llm_cache_key(action: str, payload: dict, reasoning: str) -> str:
+    """
+    Key for --llm-cache entries: sha1 over the action, normalized payload and reasoning.
+    The payload must not include the `pii` report; its scan_ms differs every run.
+    """
+    raw = json.dumps([action, payload, reasoning], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _init_worker(llm_cache_path):
+    global _LLM_CACHE
+    if llm_cache_path:
+        with open(llm_cache_path, encoding="utf-8") as f:
+            _LLM_CACHE = json.load(f)
+
+
+def _llm_score(record: dict, action: str, payload: dict):
+    """
+    Recorded score -> cached score -> evaluate_risk() stub (0.0-1.0 scaled to 0-100).
+    """
+    if record.get("llm_score") is not None:
+        return record["llm_score"], record.get("llm_analysis") or ""
+
+    if _LLM_CACHE:
+        cached = _LLM_CACHE.get(llm_cache_key(action, payload, record.get("reasoning", "")))
+        if cached is not None:
+            return cached, ""
+
+    stub = evaluate_risk(action, payload)
+    return round(stub["risk_score"] * 100), stub["reason"]
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def replay_record(record: dict, baseline: dict, candidate: dict):
+    """
+    Returns (baseline_decision, candidate_decision) for one logged action.
+    A payload the live endpoint would reject as malformed counts as HARD_BLOCK.
+    """
+    action = record.get("action") or ""
+    try:
+        typed = normalize_payload(action, record.get("payload") or {})
+    except ValidationError:
+        return HARD_BLOCK, HARD_BLOCK
+
+    payload = typed.model_dump()
+    pii_report = getattr(typed, "pii", None)
+    if pii_report is None and isinstance((record.get("payload") or {}).get("pii"), dict):
+        # Logs of already-normalized payloads carry the detection result
+        pii_report = PiiReport.model_validate(record["payload"]["pii"])
+
+    score, analysis = _llm_score(record, action, typed.model_dump(exclude={"pii"}))
+    agent_id = record.get("agent_id") or ""
+
+    before = apply_sentinel_policy(
+        action, payload, agent_id, score, analysis, pii_report, baseline
+    )
+    after = apply_sentinel_policy(
+        action, payload, agent_id, score, analysis, pii_report, candidate
+    )
+    return before["decision"], after["decision"]
+
+
+def _replay_chunk(lines: list, baseline: dict, candidate: dict) -> dict:
+    transitions = Counter()
+    by_action = Counter()
+    invalid = 0
+    failed = 0
+    first_error = None
+    first_ts = None
+    last_ts = None
+
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            invalid += 1
+            continue
+        # /execute rejects a non-object payload before it reaches the policy
+        if not isinstance(record, dict) or not isinstance(record.get("payload") or {}, dict):
+            invalid += 1
+            continue
+
+        # One bad record must not kill the worker (and with it the whole pool)
+        try:
+            before, after = replay_record(record, baseline, candidate)
+        except Exception as e:
+            failed += 1
+            if first_error is None:
+                first_error = f"{type(e).__name__}: {e} in {line.strip()[:200]}"
+            continue
+        transitions[(before, after)] += 1
+        by_action[(record.get("action") or "", before, after)] += 1
+
+        ts = _timestamp(record.get("timestamp"))
+        if ts is not None:
+            first_ts = ts if first_ts is None else min(first_ts, ts)
+            last_ts = ts if last_ts is None else max(last_ts, ts)
+
+    return {
+        "transitions": transitions,
+        "by_action": by_action,
+        "invalid": invalid,
+        "failed": failed,
+        "first_error": first_error,
+        "first_ts": first_ts,
+        "last_ts": last_ts,
+    }
+
+
+def _chunks(path: str, chunk_size: int):
+    chunk = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            chunk.append(line)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def simulate(
+    log_path: str,
+    candidate: dict,
+    baseline: dict = None,
+    workers: int = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    llm_cache_path: str = None,
+) -> dict:
+    """
+    Replay `log_path` under baseline and candidate thresholds (each merged over
+    DEFAULT_THRESHOLDS) across a process pool and summarize the difference.
+    """
+    baseline = {**DEFAULT_THRESHOLDS, **(baseline or {})}
+    candidate = {**DEFAULT_THRESHOLDS, **(candidate or {})}
+    workers = workers or os.cpu_count() or 1
+
+    transitions = Counter()
+    by_action = Counter()
+    invalid = 0
+    failed = 0
+    first_error = None
+    first_ts = None
+    last_ts = None
+
+    start = time.perf_counter()
+    work = partial(_replay_chunk, baseline=baseline, candidate=candidate)
+    with Pool(workers, initializer=_init_worker, initargs=(llm_cache_path,)) as pool:
+        for part in pool.imap_unordered(work, _chunks(log_path, chunk_size)):
+            transitions.update(part["transitions"])
+            by_action.update(part["by_action"])
+            invalid += part["invalid"]
+            failed += part["failed"]
+            first_error = first_error or part["first_error"]
+            for ts in (part["first_ts"], part["last_ts"]):
+                if ts is not None:
+                    first_ts = ts if first_ts is None else min(first_ts, ts)
+                    last_ts = ts if last_ts is None else max(last_ts, ts)
+    elapsed = time.perf_counter() - start
+
+    total = sum(transitions.values())
+    before_counts = Counter()
+    after_counts = Counter()
+    for (before, after), count in transitions.items():
+        before_counts[before] += count
+        after_counts[after] += count
+
+    call_delta_by_action = Counter()
+    for (action, before, after), count in by_action.items():
+        call_delta_by_action[action] += count * (
+            (after == VOICE_AUTH) - (before == VOICE_AUTH)
+        )
+
+    days = (last_ts - first_ts) / 86400 if first_ts is not None and last_ts > first_ts else None
+
+    return {
+        "actions": total,
+        "invalid_lines": invalid,
+        "failed_records": failed,
+        "first_error": first_error,
+        "elapsed_seconds": round(elapsed, 2),
+        "actions_per_second": round(total / elapsed) if elapsed > 0 else None,
+        "workers": workers,
+        "baseline": {d: before_counts[d] for d in DECISIONS},
+        "candidate": {d: after_counts[d] for d in DECISIONS},
+        "changed": {
+            f"{before} -> {after}": count
+            for (before, after), count in sorted(transitions.items())
+            if before != after
+        },
+        "voice_calls": {
+            "baseline": before_counts[VOICE_AUTH],
+            "candidate": after_counts[VOICE_AUTH],
+            "delta": after_counts[VOICE_AUTH] - before_counts[VOICE_AUTH],
+            "baseline_per_day": round(before_counts[VOICE_AUTH] / days, 1) if days else None,
+            "candidate_per_day": round(after_counts[VOICE_AUTH] / days, 1) if days else None,
+        },
+        "voice_call_delta_by_action": {
+            action: delta for action, delta in sorted(call_delta_by_action.items()) if delta
+        },
+    }
+
+
+def print_report(report: dict):
+    print(
+        f"📊 [SIMULATION] Replayed {report['actions']} actions in "
+        f"{report['elapsed_seconds']}s ({report['actions_per_second']}/s, "
+        f"{report['workers']} workers)"
+    )
+    if report["invalid_lines"]:
+        print(f"⚠️ [SIMULATION] Skipped {report['invalid_lines']} unparseable or invalid lines")
+    if report["failed_records"]:
+        print(
+            f"⚠️ [SIMULATION] Skipped {report['failed_records']} records that failed to "
+            f"replay (first: {report['first_error']})"
+        )
+
+    print(f"\n    {'decision':<14}{'baseline':>12}{'candidate':>12}{'delta':>10}")
+    for decision in DECISIONS:
+        before = report["baseline"][decision]
+        after = report["candidate"][decision]
+        print(f"    {decision:<14}{before:>12}{after:>12}{after - before:>+10}")
+
+    calls = report["voice_calls"]
+    pct = f" ({calls['delta'] / calls['baseline']:+.1%})" if calls["baseline"] else ""
+    print(
+        f"\n📞 Expected voice escalations: {calls['baseline']} -> {calls['candidate']} "
+        f"({calls['delta']:+}){pct}"
+    )
+    if calls["baseline_per_day"] is not None:
+        print(
+            f"    per day: {calls['baseline_per_day']} -> {calls['candidate_per_day']}"
+        )
+
+    if report["changed"]:
+        print("\n🔀 Changed decisions:")
+        for transition, count in report["changed"].items():
+            print(f"    {transition}: {count}")
+    if report["voice_call_delta_by_action"]:
+        print("\n    voice-call delta by action:")
+        for action, delta in report["voice_call_delta_by_action"].items():
+            print(f"    {action:<16}{delta:+}")
+
+
+def _parse_overrides(pairs: list) -> dict:
+    overrides = {}
+    for pair in pairs or []:
+        key, sep, value = pair.partition("=")
+        if not sep or key not in DEFAULT_THRESHOLDS:
+            raise SystemExit(
+                f"Invalid --set {pair!r}; known thresholds: {', '.join(DEFAULT_THRESHOLDS)}"
+            )
+        number = float(value)
+        overrides[key] = int(number) if number.is_integer() else number
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay an action log through the Sentinel policy and compare thresholds."
+    )
+    parser.add_argument("log", help="JSON Lines action log")
+    parser.add_argument("--set", action="append", metavar="KEY=VALUE",
+                        help="candidate threshold override (repeatable)")
+    parser.add_argument("--baseline-set", action="append", metavar="KEY=VALUE",
+                        help="baseline threshold override (defaults to current policy)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--llm-cache", help="JSON object mapping llm_cache_key -> risk_score")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = simulate(
+        args.log,
+        candidate=_parse_overrides(args.set),
+        baseline=_parse_overrides(args.baseline_set),
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        llm_cache_path=args.llm_cache,
+    )
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
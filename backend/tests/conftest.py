@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Backend modules import each other flat (e.g. `from outbox import Outbox`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
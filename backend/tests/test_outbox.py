@@ -0,0 +1,261 @@
+"""
+Crash recovery for the durable outbox: a process dies mid-approval with call
+actions still in flight, and a fresh Outbox on the same file picks up where it
+left off.
+"""
+
+import importlib
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+import outbox as outbox_module
+
+
+class Crash(BaseException):
+    """
+    Stands in for the process dying: not an Exception, so nothing in main.py
+    catches it and no status after the crash point gets written.
+    """
+
+
+@pytest.fixture
+def outbox_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "sentinel_outbox.db")
+    monkeypatch.setenv("SENTINEL_OUTBOX_PATH", path)
+    monkeypatch.setenv("SENTINEL_WARMUP", "0")
+    # OUTBOX_PATH is read at import
+    importlib.reload(outbox_module)
+    return path
+
+
+def drain(outbox, deliver):
+    """
+    Deliver everything due, the way start_replay_worker does.
+    """
+    while True:
+        due = outbox.due_actions()
+        if not due:
+            return
+        for entry in due:
+            if outbox.claim(entry["id"]):
+                deliver(entry["id"], entry["path"], entry["body"])
+
+
+def action_status(outbox, path):
+    return outbox._submit(
+        lambda conn: [
+            r["status"]
+            for r in conn.execute("SELECT status FROM call_actions WHERE path = ?", (path,))
+        ]
+    )
+
+
+# ---------------------------------------------------------------------
+#  OUTBOX
+# ---------------------------------------------------------------------
+
+
+def test_default_path_comes_from_env(outbox_path):
+    outbox = outbox_module.Outbox()
+    assert outbox.path == outbox_path
+    outbox.close()
+
+
+def test_recovers_pending_approval_and_call_actions_after_crash(outbox_path):
+    outbox = outbox_module.Outbox()
+    outbox.save_pending(
+        "txn-1", "agent-1", "PAY_INVOICE", {"amount": 9000, "vendor": "Acme"},
+        "quarterly invoice", 72, "Unknown vendor", "BLOCKED_AWAITING_AUTH",
+    )
+    _, _, dial_status = outbox.enqueue_call_action("/calls", {"to": "+15550100"})
+    _, speak, speak_status = outbox.enqueue_call_action(
+        "/calls/call-1/actions/speak", {"payload": "Approve payment?"}
+    )
+    _, hangup, hangup_status = outbox.enqueue_call_action("/calls/call-1/actions/hangup", {})
+    assert (dial_status, speak_status, hangup_status) == ("sending", "sending", "queued")
+
+    # Crash: none of the in-flight requests got as far as mark_sent()
+    outbox.close()
+
+    restarted = outbox_module.Outbox()
+    restarted.recover()
+
+    pending = restarted.load_pending()
+    assert pending["id"] == "txn-1"
+    assert pending["status"] == "BLOCKED_AWAITING_AUTH"
+    assert pending["payload"] == {"amount": 9000, "vendor": "Acme"}
+
+    delivered = []
+
+    def deliver(entry_id, path, body):
+        delivered.append((path, body))
+        restarted.mark_sent(entry_id)
+
+    drain(restarted, deliver)
+    assert [path for path, _ in delivered] == [
+        "/calls/call-1/actions/speak",
+        "/calls/call-1/actions/hangup",
+    ]
+    command_ids = [body["command_id"] for _, body in delivered]
+    assert command_ids == [speak["command_id"], hangup["command_id"]]
+
+    # The dial's outcome is unknown, so it is dropped rather than resent
+    assert action_status(restarted, "/calls") == ["dead"]
+
+    # A second restart finds nothing left to send
+    restarted.close()
+    again = outbox_module.Outbox()
+    again.recover()
+    delivered.clear()
+    drain(again, deliver)
+    assert delivered == []
+    again.close()
+
+
+def test_failed_dial_is_not_retried(outbox_path):
+    outbox = outbox_module.Outbox()
+    dial_id, _, _ = outbox.enqueue_call_action("/calls", {"to": "+15550100"})
+    speak_id, _, _ = outbox.enqueue_call_action(
+        "/calls/call-1/actions/speak", {"payload": "Approve payment?"}
+    )
+
+    outbox.mark_failed(dial_id, "read timeout")
+    outbox.mark_failed(speak_id, "read timeout")
+
+    statuses = outbox._submit(
+        lambda conn: dict(conn.execute("SELECT id, status FROM call_actions").fetchall())
+    )
+    assert statuses == {dial_id: "dead", speak_id: "queued"}
+    outbox.close()
+
+
+def test_stale_pending_approval_is_declined_not_restored(outbox_path):
+    outbox = outbox_module.Outbox()
+    outbox.save_pending(
+        "txn-old", "agent-1", "PAY_INVOICE", {"amount": 9000}, "r", 72, "x",
+        "BLOCKED_AWAITING_AUTH",
+    )
+
+    assert outbox.load_pending(max_age=0) is None
+    status = outbox._submit(
+        lambda conn: conn.execute(
+            "SELECT status FROM pending_transactions WHERE id = 'txn-old'"
+        ).fetchone()["status"]
+    )
+    assert status == "DECLINED"
+    outbox.close()
+
+
+def test_purge_keeps_unfinished_rows(outbox_path):
+    outbox = outbox_module.Outbox()
+    sent_id, _, _ = outbox.enqueue_call_action("/calls/call-1/actions/speak", {})
+    outbox.mark_sent(sent_id)
+    dial_id, _, _ = outbox.enqueue_call_action("/calls", {"to": "+15550100"})
+    outbox.mark_failed(dial_id, "read timeout")
+    queued_id, _, _ = outbox.enqueue_call_action("/calls/call-2/actions/speak", {}, send_now=False)
+    outbox.save_pending("txn-1", "a", "EXPORT_CSV", {}, "r", 95, "x", "DECLINED")
+    outbox.save_pending("txn-2", "a", "EXPORT_CSV", {}, "r", 95, "x", "BLOCKED_AWAITING_AUTH")
+
+    assert outbox.purge(retention=-1) == (2, 1)
+    remaining = outbox._submit(
+        lambda conn: (
+            [r["id"] for r in conn.execute("SELECT id FROM call_actions")],
+            [r["id"] for r in conn.execute("SELECT id FROM pending_transactions")],
+        )
+    )
+    assert remaining == ([queued_id], ["txn-2"])
+    outbox.close()
+
+
+# ---------------------------------------------------------------------
+#  MAIN.PY RESTART PATH
+# ---------------------------------------------------------------------
+
+
+class FakeTelnyx:
+    """
+    Records posts; raises Crash on the paths listed in `crash_on`.
+    """
+
+    def __init__(self, crash_on=()):
+        self.crash_on = crash_on
+        self.posts = []
+
+    def post(self, url, json=None):
+        if any(url.endswith(path) for path in self.crash_on):
+            raise Crash(url)
+        self.posts.append((url, json))
+        return SimpleNamespace(ok=True, status_code=200, text="{}")
+
+
+class NoSentry:
+    @contextmanager
+    def start_transaction(self, **kwargs):
+        yield SimpleNamespace(set_data=lambda *args: None)
+
+    def set_tag(self, *args):
+        pass
+
+
+def start_process(monkeypatch, telnyx):
+    """
+    Import main fresh, as a new server process would, with Groq, Sentry and
+    Telnyx replaced by fakes.
+    """
+    main = importlib.reload(importlib.import_module("main"))
+    monkeypatch.setattr(main, "get_sentry", lambda: NoSentry())
+    monkeypatch.setattr(main, "get_telnyx_session", lambda: telnyx)
+    monkeypatch.setattr(main, "analyze_risk_with_groq", lambda *args: (90, "Unknown vendor"))
+    monkeypatch.setattr(main, "ADMIN_PHONE_NUMBER", "+15550100")
+    monkeypatch.setattr(main, "TELNYX_PHONE_NUMBER", "+15550199")
+    return main
+
+
+def test_main_restores_approval_and_drops_dial_after_crash(outbox_path, monkeypatch):
+    main = start_process(monkeypatch, FakeTelnyx(crash_on=("/calls",)))
+    request = main.ActionRequest(
+        agent_id="session_test",
+        action="PAY_INVOICE",
+        payload={"amount": 10000, "vendor": "Unknown Corp"},
+        reasoning="Autonomous payment",
+    )
+    with pytest.raises(Crash):
+        main.process_action(request)
+    main.get_outbox().close()
+
+    telnyx = FakeTelnyx()
+    main = start_process(monkeypatch, telnyx)
+    main.get_outbox().recover()
+    main.restore_pending_transaction()
+
+    assert main.CURRENT_STATE["status"] == "BLOCKED_AWAITING_AUTH"
+    assert main.LAST_TRANSACTION["action"] == "PAY_INVOICE"
+    assert main.LAST_TRANSACTION["payload"]["amount"] == 10000
+
+    drain(main.get_outbox(), main.deliver_call_action)
+    assert telnyx.posts == []
+    assert action_status(main.get_outbox(), "/calls") == ["dead"]
+    main.get_outbox().close()
+
+
+def test_main_resends_call_action_once_after_crash(outbox_path, monkeypatch):
+    path = "/calls/call-1/actions/speak"
+    main = start_process(monkeypatch, FakeTelnyx(crash_on=(path,)))
+    with pytest.raises(Crash):
+        main.telnyx_post(path, {"payload": "Approve payment?"})
+    main.get_outbox().close()
+
+    telnyx = FakeTelnyx()
+    main = start_process(monkeypatch, telnyx)
+    main.get_outbox().recover()
+    drain(main.get_outbox(), main.deliver_call_action)
+    drain(main.get_outbox(), main.deliver_call_action)
+
+    assert len(telnyx.posts) == 1
+    url, body = telnyx.posts[0]
+    assert url.endswith(path)
+    assert body["command_id"].startswith("sentinel-")
+    assert action_status(main.get_outbox(), path) == ["sent"]
+    main.get_outbox().close()